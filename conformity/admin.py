@@ -2,11 +2,16 @@
 Customize Django Admin Site to manage my Models instances
 """
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Organization, Framework, Requirement, Conformity, Audit, Finding, Action, Control, ControlPoint, \
-    Attachment, Indicator, IndicatorPoint
+    Attachment, Indicator, IndicatorPoint, FrameworkScore, ConformityHistory, JobLease
+from .forms import RequirementLoadForm
+from .loader import COLUMNS, load_requirements, read_rows
 
 
 class OrganizationResources(resources.ModelResource):
@@ -26,7 +31,45 @@ class FrameworkResources(resources.ModelResource):
 
 class FrameworkAdmin(ImportExportModelAdmin):
     ressource_class = Framework
-    list_select_related = ['attachment']
+    actions = ['load_requirements']
+
+    @admin.action(description="Load requirements from a file")
+    def load_requirements(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one framework to load requirements into", messages.ERROR)
+            return None
+        framework = queryset.get()
+
+        form = RequirementLoadForm(request.POST, request.FILES) if 'apply' in request.POST else RequirementLoadForm()
+        if form.is_valid():
+            file_format = form.cleaned_data['format']
+            content = form.cleaned_data['file'].read()
+            if file_format not in ('xlsx', 'ods'):
+                content = content.decode('utf-8-sig')
+            try:
+                stats = load_requirements(framework, read_rows(content, file_format))
+            except ValidationError as e:
+                for message in e.messages:
+                    self.message_user(request, message, messages.ERROR)
+                return None
+            except Exception as e:
+                self.message_user(request, f"Unable to read the file: {e}", messages.ERROR)
+                return None
+            timings = stats['timings']
+            self.message_user(request, f"{stats['created']} requirements loaded in {framework} "
+                                       f"(prepare {timings['prepare']:.3f}s, insert {timings['insert']:.3f}s, "
+                                       f"rebuild {timings['rebuild']:.3f}s)", messages.SUCCESS)
+            return None
+
+        return TemplateResponse(request, 'admin/conformity/framework/load_requirements.html', {
+            **self.admin_site.each_context(request),
+            'title': "Load requirements",
+            'opts': self.model._meta,
+            'framework': framework,
+            'form': form,
+            'columns': COLUMNS,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
 
 
 class RequirementResources(resources.ModelResource):
@@ -49,6 +92,26 @@ class ConformityAdmin(ImportExportModelAdmin):
     list_select_related = ['organization', 'requirement']
 
 
+class FrameworkScoreResources(resources.ModelResource):
+    class Meta:
+        model = FrameworkScore
+
+
+class FrameworkScoreAdmin(ImportExportModelAdmin):
+    ressource_class = FrameworkScore
+    list_select_related = ['organization', 'framework']
+
+
+class ConformityHistoryResources(resources.ModelResource):
+    class Meta:
+        model = ConformityHistory
+
+
+class ConformityHistoryAdmin(ImportExportModelAdmin):
+    ressource_class = ConformityHistory
+    list_select_related = ['organization', 'requirement']
+
+
 class ActionResources(resources.ModelResource):
     class Meta:
         model = Action
@@ -121,15 +184,27 @@ class IndicatorPointAdmin(ImportExportModelAdmin):
     ressource_class = IndicatorPoint
 
 
+
+class JobLeaseResources(resources.ModelResource):
+    class Meta:
+        model = JobLease
+
+
+class JobLeaseAdmin(ImportExportModelAdmin):
+    ressource_class = JobLease
+
 # Registration
 admin.site.register(Action, ActionAdmin)
 admin.site.register(Attachment, AttachmentAdmin)
 admin.site.register(Audit, AuditAdmin)
 admin.site.register(Conformity, ConformityAdmin)
+admin.site.register(ConformityHistory, ConformityHistoryAdmin)
 admin.site.register(Control, ControlAdmin)
 admin.site.register(ControlPoint, ControlPointAdmin)
 admin.site.register(Finding, FindingAdmin)
 admin.site.register(Framework, FrameworkAdmin)
+admin.site.register(FrameworkScore, FrameworkScoreAdmin)
+admin.site.register(JobLease, JobLeaseAdmin)
 admin.site.register(Organization, OrganizationAdmin)
 admin.site.register(Requirement, RequirementAdmin)
 admin.site.register(Indicator, IndicatorAdmin)
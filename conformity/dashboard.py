@@ -0,0 +1,78 @@
+"""
+Data of the home dashboard, in two cached blocks:
+ - the shared block: the counters, one conditional aggregate query per model, and the short lists of
+   frameworks, organizations, audits and controls to evaluate;
+ - the block of each user: its active actions and conformities, with their relations selected.
+Both are cached for settings.DASHBOARD_CACHE_TTL seconds and dropped by the signals of the models they show.
+With the default local memory cache, the signals only drop the blocks of the process handling the change:
+the other WSGI workers show them stale for up to DASHBOARD_CACHE_TTL seconds (see CACHES in the settings).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Action, Audit, Conformity, ControlPoint, Framework, Organization, PeriodicPointQuerySet
+
+# Maximum number of rows of each list
+LIST_SIZE = 50
+
+SHARED_KEY = 'conformity:dashboard'
+
+
+def user_key(user_id):
+    return f'conformity:dashboard:user:{user_id}'
+
+
+def counters():
+    """Return the dashboard counters, a single aggregate query per model"""
+    return {
+        **Organization.objects.aggregate(organizations=Count('pk')),
+        **Framework.objects.aggregate(frameworks=Count('pk')),
+        **Audit.objects.aggregate(audits=Count('pk')),
+        **Action.objects.aggregate(actions=Count('pk'), active_actions=Count('pk', filter=Q(active=True))),
+        **ControlPoint.objects.aggregate(
+            controls_to_evaluate=Count('pk', filter=PeriodicPointQuerySet.effective_q('TOBE'))),
+    }
+
+
+def shared_block():
+    """Return the part of the dashboard common to every user"""
+    block = cache.get(SHARED_KEY)
+    if block is None:
+        block = {
+            'counters': counters(),
+            'framework_list': list(Framework.objects.all()[:LIST_SIZE]),
+            'organization_list': list(Organization.objects.all()[:LIST_SIZE]),
+            'audit_list': list(Audit.objects.select_related('organization')[:LIST_SIZE]),
+            'cp_list': list(ControlPoint.objects.effective('TOBE').with_effective_status()
+                            .select_related('control__organization').order_by('period_end_date')[:LIST_SIZE]),
+        }
+        cache.set(SHARED_KEY, block, settings.DASHBOARD_CACHE_TTL)
+    return block
+
+
+def user_block(user):
+    """Return the part of the dashboard of the user"""
+    key = user_key(user.pk)
+    block = cache.get(key)
+    if block is None:
+        block = {
+            'my_action': list(Action.objects.filter(owner=user, active=True)
+                              .select_related('organization').order_by('status')[:LIST_SIZE]),
+            'my_conformity': list(Conformity.objects.filter(responsible=user)
+                                  .select_related('organization', 'requirement').order_by('status')[:LIST_SIZE]),
+        }
+        cache.set(key, block, settings.DASHBOARD_CACHE_TTL)
+    return block
+
+
+def get(user):
+    return {**shared_block(), **user_block(user)}
+
+
+def clear_shared():
+    cache.delete(SHARED_KEY)
+
+
+def clear_users(*user_ids):
+    cache.delete_many([user_key(user_id) for user_id in set(user_ids) if user_id])
@@ -1,4 +1,4 @@
-from django_filters import FilterSet
+from django_filters import ChoiceFilter, FilterSet
 from .models import Action, Control, ControlPoint
 
 
@@ -16,7 +16,13 @@ class ControlFilter(FilterSet):
 
 
 class ControlPointFilter(FilterSet):
+    status = ChoiceFilter(choices=ControlPoint.Status.choices, method='filter_effective_status')
+
     class Meta:
         model = ControlPoint
-        fields = [ 'control__id', 'control__frequency', 'status' ]
+        fields = [ 'control__id', 'control__organization', 'control__frequency', 'status' ]
+
+    @staticmethod
+    def filter_effective_status(queryset, name, value):
+        return queryset.effective(value)
 
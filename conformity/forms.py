@@ -2,7 +2,7 @@
 Forms for front-end editing of Models instance
 """
 
-from django.forms import ModelForm, FileField, ClearableFileInput
+from django.forms import Form, ModelForm, FileField, ClearableFileInput, ChoiceField
 from django.utils import timezone
 from .models import Conformity, Organization, Audit, Finding, Action, Control, ControlPoint, Indicator, IndicatorPoint
 
@@ -80,7 +80,7 @@ class ActionForm(ModelForm):
 class ControlForm(ModelForm):
     class Meta:
         model = Control
-        fields = ['title', 'description', 'organization', 'conformity', 'control', 'frequency', 'level']
+        fields = ['title', 'description', 'organization', 'conformity', 'control', 'frequency', 'schedule_anchor', 'level']
 
 
 class ControlPointForm(ModelForm):
@@ -98,7 +98,7 @@ class ControlPointForm(ModelForm):
         self.fields['control_user'].disabled = True
 
         # Set some value if the ControlPoint has to be evaluated
-        if self.get_initial_for_field(self.fields['status'], 'status') == ControlPoint.Status.TOBEEVALUATED.value:
+        if self.instance.effective_status == ControlPoint.Status.TOBEEVALUATED.value:
             self.initial['control_date'] = timezone.now()
             self.initial['control_user'] = self.user
             self.fields['status'].widget.choices = [
@@ -107,6 +107,7 @@ class ControlPointForm(ModelForm):
             ]
         # Switch to display mode if ControlPoint is not to be evaluated
         else:
+            self.initial['status'] = self.instance.effective_status
             del self.fields['attachments']
             for field in self.fields:
                 self.fields[field].disabled = True
@@ -121,4 +122,8 @@ class IndicatorForm(ModelForm):
 class IndicatorPointForm(ModelForm):
     class Meta:
         model = IndicatorPoint
-        fields = ['value', 'comment', 'attachment']
\ No newline at end of file
+        fields = ['value', 'comment', 'attachment']
+
+class RequirementLoadForm(Form):
+    file = FileField()
+    format = ChoiceField(choices=[('csv', 'CSV'), ('json', 'JSON'), ('xlsx', 'Excel (xlsx)'), ('ods', 'OpenDocument')])
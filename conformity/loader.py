@@ -0,0 +1,113 @@
+"""
+Bulk loader of the Requirement of a Framework.
+The hierarchical names are computed in memory, the Requirement are inserted level by level with bulk_create
+while the MPTT updates are disabled, then each loaded tree is rebuilt once.
+"""
+from time import perf_counter
+
+import tablib
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Requirement
+
+# Columns of the loaded files, `parent` is the name of the parent Requirement (empty for a root)
+COLUMNS = ('code', 'parent', 'order', 'title', 'description')
+
+# Checked before the insert: PostgreSQL rejects the whole load on an over-long value, SQLite keeps it
+MAX_LENGTHS = {field: Requirement._meta.get_field(field).max_length for field in ('code', 'name', 'title')}
+
+
+def read_rows(content, format='csv'):
+    """Return the rows of a csv, json, xlsx... file content, as dicts of the loader columns"""
+    dataset = tablib.Dataset().load(content, format=format)
+    return [{column: row.get(column) for column in COLUMNS} for row in dataset.dict]
+
+
+def load_requirements(framework, rows):
+    """
+    Create the Requirement of the rows in the Framework and return the loading statistics.
+    A row may refer to a parent loaded in the same rows or already existing.
+    """
+    timings = {}
+    start = perf_counter()
+
+    names = set(Requirement.objects.values_list('name', flat=True))
+    existing = {name: (pk, tree_id, level) for pk, name, tree_id, level in
+                Requirement.objects.filter(framework=framework).values_list('pk', 'name', 'tree_id', 'level')}
+    by_name, errors = {}, []
+    for line, row in enumerate(rows, start=1):
+        code = str(row.get('code') or '').strip()
+        if not code:
+            errors.append(f"line {line}: missing code")
+            continue
+        parent = str(row.get('parent') or '').strip()
+        name = f"{parent}-{code}" if parent else code
+        too_long = [f"{field} {value} longer than {MAX_LENGTHS[field]} characters"
+                    for field, value in (('code', code), ('name', name), ('title', str(row.get('title') or '')))
+                    if len(value) > MAX_LENGTHS[field]]
+        if too_long:
+            errors.append(f"line {line}: {', '.join(too_long)}")
+            continue
+        if name in names or name in by_name:
+            errors.append(f"line {line}: requirement {name} already exists")
+            continue
+        try:
+            order = int(row.get('order') or 1)
+        except (TypeError, ValueError):
+            errors.append(f"line {line}: invalid order {row.get('order')}")
+            continue
+        by_name[name] = {'name': name, 'parent': parent, 'code': code, 'line': line, 'order': order,
+                         'title': row.get('title') or '', 'description': row.get('description') or ''}
+
+    # Depth of each loaded row, from its closest loaded or existing ancestor
+    def depth(name, seen=()):
+        node = by_name[name]
+        if not node['parent']:
+            return 0
+        if node['parent'] in existing:
+            return existing[node['parent']][2] + 1
+        if node['parent'] not in by_name or node['parent'] in seen:
+            raise KeyError(node['parent'])
+        return depth(node['parent'], seen + (name,)) + 1
+
+    levels = {}
+    for name, node in by_name.items():
+        try:
+            levels.setdefault(depth(name), []).append(node)
+        except KeyError as e:
+            errors.append(f"line {node['line']}: unknown parent {e.args[0]}")
+    if errors:
+        raise ValidationError(errors)
+    timings['prepare'] = perf_counter() - start
+
+    start = perf_counter()
+    created, trees = {}, set()
+    with transaction.atomic(), Requirement.objects.disable_mptt_updates():
+        next_tree_id = (Requirement.objects.aggregate(last=Max('tree_id'))['last'] or 0) + 1
+        for level in sorted(levels):
+            requirements = []
+            for node in levels[level]:
+                if not node['parent']:
+                    parent_id, tree_id = None, next_tree_id
+                    next_tree_id += 1
+                elif node['parent'] in created:
+                    parent_id, tree_id = created[node['parent']].pk, created[node['parent']].tree_id
+                else:
+                    parent_id, tree_id, _ = existing[node['parent']]
+                requirements.append(Requirement(
+                    framework=framework, parent_id=parent_id, name=node['name'], code=node['code'],
+                    order=node['order'], title=node['title'], description=node['description'],
+                    tree_id=tree_id, level=level, lft=0, rght=0))
+                trees.add(tree_id)
+            for requirement in Requirement.objects.bulk_create(requirements):
+                created[requirement.name] = requirement
+        timings['insert'] = perf_counter() - start
+
+        start = perf_counter()
+        for tree_id in sorted(trees):
+            Requirement.objects.partial_rebuild(tree_id)
+        timings['rebuild'] = perf_counter() - start
+
+    return {'created': len(created), 'trees': len(trees), 'timings': timings}
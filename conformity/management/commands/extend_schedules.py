@@ -0,0 +1,23 @@
+"""
+Extend the schedules of every Control and Indicator, to be run every night (e.g. from cron).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from conformity.models import Control, Indicator
+
+
+class Command(BaseCommand):
+    help = "Create the missing ControlPoint and IndicatorPoint up to N periods ahead, for all controls and indicators"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periods', type=int, default=4,
+                            help="Number of periods to schedule after the current one (default: 4)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            controlpoints = Control.extend_schedules(options['periods'])
+            indicatorpoints = Indicator.extend_schedules(options['periods'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{controlpoints} control points and {indicatorpoints} indicator points created"))
@@ -0,0 +1,14 @@
+"""
+Generate the previews of the Attachment never processed by the background workers.
+"""
+from django.core.management.base import BaseCommand
+
+from conformity import previews
+
+
+class Command(BaseCommand):
+    help = "Generate the missing previews and text snippets of the attachments"
+
+    def handle(self, *args, **options):
+        count = previews.generate_missing()
+        self.stdout.write(self.style.SUCCESS(f"{count} attachment previews generated"))
@@ -0,0 +1,40 @@
+"""
+Load the Requirement of a Framework from a csv, json or xlsx file, in bulk.
+"""
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from conformity.loader import COLUMNS, load_requirements, read_rows
+from conformity.models import Framework
+
+
+class Command(BaseCommand):
+    help = f"Load the requirements of a framework from a file with the columns: {', '.join(COLUMNS)}"
+
+    def add_arguments(self, parser):
+        parser.add_argument('framework', help="Name of the framework, created when it does not exist")
+        parser.add_argument('file', help="File to load")
+        parser.add_argument('--format', help="File format (csv, json, xlsx...), from the file extension by default")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['file'])[1].lstrip('.').lower() or 'csv'
+        binary = file_format in ('xls', 'xlsx', 'ods')
+        try:
+            with open(options['file'], 'rb' if binary else 'r', **({} if binary else {'encoding': 'utf-8-sig'})) as f:
+                rows = read_rows(f.read(), file_format)
+        except OSError as e:
+            raise CommandError(e) from e
+
+        framework, _ = Framework.objects.get_or_create(name=options['framework'])
+        try:
+            stats = load_requirements(framework, rows)
+        except ValidationError as e:
+            raise CommandError("\n".join(e.messages)) from e
+
+        timings = stats['timings']
+        self.stdout.write(f"prepare {timings['prepare']:.3f}s, insert {timings['insert']:.3f}s, "
+                          f"rebuild {timings['rebuild']:.3f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} requirements loaded in {stats['trees']} trees of {framework}"))
@@ -0,0 +1,25 @@
+"""
+Rebuild the materialized FrameworkScore table from the Conformity trees.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from conformity.models import Conformity, FrameworkScore
+
+
+class Command(BaseCommand):
+    help = "Rebuild from scratch the FrameworkScore of every (organization, framework) conformity tree"
+
+    def handle(self, *args, **options):
+        trees = (Conformity.objects
+                 .filter(organization__isnull=False, requirement__isnull=False)
+                 .order_by()
+                 .values_list('organization', 'requirement__framework')
+                 .distinct())
+
+        with transaction.atomic():
+            FrameworkScore.objects.all().delete()
+            for organization_id, framework_id in trees:
+                FrameworkScore.refresh(organization_id, framework_id)
+
+        self.stdout.write(self.style.SUCCESS(f"{FrameworkScore.objects.count()} framework scores rebuilt"))
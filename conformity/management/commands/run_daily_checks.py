@@ -0,0 +1,24 @@
+"""
+Run the daily integrity checks (schedules of the Control and Indicator), meant to be scheduled by cron.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from conformity import sanity
+
+
+class Command(BaseCommand):
+    help = "Create the upcoming points of the control and indicator schedules, once a day"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help="Day to check (YYYY-MM-DD), today by default")
+        parser.add_argument('--force', action='store_true',
+                            help="Run the checks even when they already ran for the day")
+
+    def handle(self, *args, **options):
+        day = sanity.run_daily_checks(options['date'], force=options['force'])
+        if day is None:
+            self.stdout.write("Daily integrity checks already done or running, skipped")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Daily integrity checks done for {day}"))
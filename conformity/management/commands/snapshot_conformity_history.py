@@ -0,0 +1,26 @@
+"""
+Record the daily snapshot of the Conformity status history, to be run once a day (e.g. from cron).
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from conformity.models import ConformityHistory
+
+
+class Command(BaseCommand):
+    help = "Record in ConformityHistory the Conformity status that changed since the previous snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day of the snapshot (YYYY-MM-DD), today by default")
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {options['date']}") from e
+
+        written = ConformityHistory.snapshot(day)
+        self.stdout.write(self.style.SUCCESS(f"{written} conformity history rows written"))
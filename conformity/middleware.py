@@ -1,63 +1,32 @@
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
-from datetime import datetime
-from .models import ControlPoint, IndicatorPoint
+from . import propagation, sanity
+
+
+class ConformityPropagationMiddleware:
+    """Coalesce the Conformity status propagation of a whole request into a single flush"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with propagation.batch():
+            return self.get_response(request)
 
 
 class SanityCheckMiddleware:
-    last_checked = datetime.today()             # Class variable to store the last check date
+    """Wake up the daily integrity checks thread (see sanity.py), the checks never run in the request"""
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         response = self.get_response(request)
-        self.run_daily_checks()
+        sanity.enqueue()
         return response
 
-    def run_daily_checks(self):
-        """Performs the daily integrity checks."""
-        today = datetime.today().date()
-
-        if SanityCheckMiddleware.last_checked != today:
-            self.check_control_points(today)
-            self.check_indicator_points(today)
-            SanityCheckMiddleware.last_checked = today
-
-    @staticmethod
-    def check_control_points(today):
-        """Checks and updates the status of ControlPoint."""
-
-        """Update SCHD to TOBE when period start"""
-        scheduled_controls = ControlPoint.objects.filter(period_start_date__lte=today,
-                                                         period_end_date__gte=today,
-                                                         status="SCHD")
-        scheduled_controls.update(status='TOBE')
-
-        """Update expired TOBE to MISS """
-        missed_controls = ControlPoint.objects.filter(period_start_date__lt=today,
-                                                      period_end_date__lt=today,
-                                                      status__in=["TOBE","SCHD"])
-        missed_controls.update(status='MISS')
-
-    @staticmethod
-    def check_indicator_points(today):
-        """Checks and updates the status of IndicatorPoint."""
-
-        """Update SCHD to TOBE when period start"""
-        scheduled_indicators = IndicatorPoint.objects.filter(period_start_date__lte=today,
-                                                         period_end_date__gte=today,
-                                                         status="SCHD")
-        scheduled_indicators.update(status='TOBE')
-
-        """Update expired TOBE to MISS """
-        missed_indicators = IndicatorPoint.objects.filter(period_start_date__lt=today,
-                                                      period_end_date__lt=today,
-                                                      status__in=["TOBE","SCHD"])
-        missed_indicators.update(status='MISS')
 
 # Connect the user login signal
 @receiver(user_logged_in)
 def update_on_login(sender, user, request, **kwargs):
-    middleware = SanityCheckMiddleware(None)
-    middleware.run_daily_checks()
\ No newline at end of file
+    sanity.enqueue()
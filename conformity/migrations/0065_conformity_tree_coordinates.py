@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_tree_coordinates(apps, schema_editor):
+    Conformity = apps.get_model('conformity', 'Conformity')
+    Requirement = apps.get_model('conformity', 'Requirement')
+    requirement = Requirement.objects.filter(pk=OuterRef('requirement')).order_by()
+    Conformity.objects.filter(requirement__isnull=False).update(
+        tree_id=Subquery(requirement.values('tree_id')),
+        lft=Subquery(requirement.values('lft')),
+        rght=Subquery(requirement.values('rght')),
+        level=Subquery(requirement.values('level')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0064_indicator_indicatorpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='conformity',
+            options={'ordering': ['organization', 'requirement__framework', 'tree_id', 'lft'], 'verbose_name': 'Conformity', 'verbose_name_plural': 'Conformities'},
+        ),
+        migrations.AddField(
+            model_name='conformity',
+            name='level',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='conformity',
+            name='lft',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='conformity',
+            name='rght',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='conformity',
+            name='tree_id',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='conformity',
+            index=models.Index(fields=['organization', 'tree_id', 'lft'], name='conformity__organiz_b238bd_idx'),
+        ),
+        migrations.RunPython(copy_tree_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+
+
+def populate_scores(apps, schema_editor):
+    Conformity = apps.get_model('conformity', 'Conformity')
+    FrameworkScore = apps.get_model('conformity', 'FrameworkScore')
+    trees = (Conformity.objects
+             .filter(organization__isnull=False, requirement__isnull=False)
+             .order_by()
+             .values_list('organization', 'requirement__framework')
+             .distinct())
+    for organization_id, framework_id in trees:
+        tree = Conformity.objects.filter(organization=organization_id, requirement__framework=framework_id).order_by()
+        roots = [status for status in tree.filter(level=0).values_list('status', flat=True) if status is not None]
+        leaves = tree.filter(level__gt=0, rght=F('lft') + 1).aggregate(
+            number=Count('pk'),
+            applicable=Count('pk', filter=Q(applicable=True)),
+            evaluated=Count('pk', filter=Q(status__isnull=False)),
+        )
+        FrameworkScore.objects.create(
+            organization_id=organization_id,
+            framework_id=framework_id,
+            status=int(sum(roots) / len(roots)) if roots else None,
+            completeness=round(leaves['evaluated'] / leaves['number'] * 100) if leaves['number'] else 0,
+            leaf_number=leaves['number'],
+            leaf_applicable=leaves['applicable'],
+            leaf_evaluated=leaves['evaluated'],
+            last_update=tree.aggregate(last=Max('status_last_update'))['last'],
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0065_conformity_tree_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrameworkScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField(blank=True, null=True)),
+                ('completeness', models.IntegerField(default=0)),
+                ('leaf_number', models.PositiveIntegerField(default=0)),
+                ('leaf_applicable', models.PositiveIntegerField(default=0)),
+                ('leaf_evaluated', models.PositiveIntegerField(default=0)),
+                ('last_update', models.DateTimeField(blank=True, null=True)),
+                ('framework', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='conformity.framework')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='conformity.organization')),
+            ],
+            options={
+                'ordering': ['organization', 'framework'],
+                'unique_together': {('organization', 'framework')},
+            },
+        ),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0066_frameworkscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConformityHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.IntegerField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='conformity.organization')),
+                ('requirement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='conformity.requirement')),
+            ],
+            options={
+                'verbose_name_plural': 'conformity history',
+                'ordering': ['organization', 'requirement', 'date'],
+                'unique_together': {('organization', 'requirement', 'date')},
+            },
+        ),
+    ]
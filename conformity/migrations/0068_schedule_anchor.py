@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0067_conformityhistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='control',
+            name='schedule_anchor',
+            field=models.DateField(blank=True, help_text='Start of a period, January 1st (a Monday for weekly) by default', null=True),
+        ),
+        migrations.AddField(
+            model_name='indicator',
+            name='schedule_anchor',
+            field=models.DateField(blank=True, help_text='Start of a period, January 1st (a Monday for weekly) by default', null=True),
+        ),
+        migrations.AlterField(
+            model_name='control',
+            name='frequency',
+            field=models.IntegerField(choices=[(1, 'Yearly'), (2, 'Half-Yearly'), (4, 'Quarterly'), (6, 'Bimonthly'), (12, 'Monthly'), (52, 'Weekly')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='indicator',
+            name='frequency',
+            field=models.IntegerField(choices=[(1, 'Yearly'), (2, 'Half-Yearly'), (4, 'Quarterly'), (6, 'Bimonthly'), (12, 'Monthly'), (52, 'Weekly')], default=4),
+        ),
+    ]
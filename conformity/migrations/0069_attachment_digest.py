@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0068_schedule_anchor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
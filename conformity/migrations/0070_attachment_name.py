@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:58
+
+import os
+
+from django.db import migrations, models
+
+
+def name_attachments(apps, schema_editor):
+    Attachment = apps.get_model('conformity', 'Attachment')
+    attachments = list(Attachment.objects.only('pk', 'file'))
+    for attachment in attachments:
+        attachment.name = os.path.basename(attachment.file.name)
+    Attachment.objects.bulk_update(attachments, ['name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0069_attachment_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(name_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0070_attachment_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='preview',
+            field=models.FileField(blank=True, upload_to='attachments/'),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='preview_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='snippet',
+            field=models.TextField(blank=True),
+        ),
+    ]
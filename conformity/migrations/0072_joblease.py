@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0071_attachment_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('last_run', models.DateField(blank=True, null=True)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
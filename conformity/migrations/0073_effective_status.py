@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_derived_status(apps, schema_editor):
+    """The To evaluate / Missed status derive from the date now, only the evaluation results stay stored"""
+    ControlPoint = apps.get_model('conformity', 'ControlPoint')
+    IndicatorPoint = apps.get_model('conformity', 'IndicatorPoint')
+    ControlPoint.objects.filter(status__in=['TOBE', 'MISS']).update(status='SCHD')
+    IndicatorPoint.objects.filter(status='TOBE').update(status='SCHD')
+    IndicatorPoint.objects.filter(status='MISS', value__isnull=True).update(status='SCHD')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conformity', '0072_joblease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='controlpoint',
+            index=models.Index(fields=['status', 'period_start_date', 'period_end_date'], name='controlpoint_status_period'),
+        ),
+        migrations.AddIndex(
+            model_name='indicatorpoint',
+            index=models.Index(fields=['status', 'period_start_date', 'period_end_date'], name='indicatorpoint_status_period'),
+        ),
+        migrations.RunPython(clear_derived_status, migrations.RunPython.noop),
+    ]
@@ -3,17 +3,21 @@ Conformity module manage all the manual declarative aspect of conformity managem
 It's Organized around Organization, Framework, Requirement and Conformity classes.
 """
 # Standard library
-from calendar import monthrange
+import hashlib
+import os
 from datetime import date, timedelta
+from functools import lru_cache
 from typing import List, Literal, Tuple
 
 # Django (third-party)
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Count, Q
+from django.db import models, transaction
+from django.db.models import Case, CharField, Count, Exists, F, OuterRef, Prefetch, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -21,12 +25,67 @@ from django.utils.translation import gettext_lazy as _
 # Third-party
 from auditlog.context import set_actor
 from magic import Magic
+from mptt.managers import TreeManager
 from mptt.models import MPTTModel, TreeForeignKey
 from pycountry import languages
 
+# Local
+from . import propagation, schedule
+
 User = get_user_model()
 
 
+class DirtyFieldsMixin(models.Model):
+    """
+    Snapshot the field values when the instance is loaded and after each save,
+    so that signal handlers can tell which fields a save actually changed.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_fields()
+        return instance
+
+    def snapshot_fields(self, fields=None):
+        """Remember the current value of the loaded fields as the saved ones, only of the `fields` names if given"""
+        if fields is None or getattr(self, '_loaded_values', None) is None:
+            self._loaded_values = {f.attname: self.__dict__[f.attname]
+                                   for f in self._meta.concrete_fields if f.attname in self.__dict__}
+            return
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                self._loaded_values[attname] = self.__dict__[attname]
+
+    @property
+    def changed_fields(self) -> set:
+        """Return the name of the fields changed since the load or the last save, all of them for a new instance"""
+        loaded = getattr(self, '_loaded_values', None)
+        fields = [f for f in self._meta.concrete_fields if f.attname in self.__dict__]
+        if loaded is None:
+            return {f.name for f in fields}
+        return {f.name for f in fields
+                if f.attname not in loaded or loaded[f.attname] != self.__dict__[f.attname]}
+
+    def has_changed(self, *fields) -> bool:
+        """Return True when one of the `fields` changed since the load or the last save"""
+        return not self.changed_fields.isdisjoint(fields)
+
+    def save(self, *args, **kwargs):
+        # post_save handlers run inside save(), they still see the previous snapshot
+        super().save(*args, **kwargs)
+        # Only the written fields are saved values now
+        self.snapshot_fields(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.snapshot_fields(kwargs.get('fields'))
+
+
 class FrameworkManager(models.Manager):
     def get_by_natural_key(self, name):
         return self.get(name=name)
@@ -84,7 +143,6 @@ class Framework(models.Model):
 
     def get_requirements_number(self):
         """return the number of leaf Requirement related to the Framework"""
-        from django.db.models import F
         return Requirement.objects.filter(framework=self, rght=F('lft') + 1).count()
 
     def get_root_requirement(self):
@@ -95,6 +153,39 @@ class Framework(models.Model):
         """return the Requirement of the first hierarchical level of the Framework"""
         return Requirement.objects.filter(framework=self, parent__parent__isnull=True).order_by('order')
 
+    def get_matrix(self):
+        """
+        return the (organizations, requirements, grid) comparison of the Organization on the first level Requirement.
+        grid maps (organization_id, requirement_id) to (status, applicable). Cached until a Conformity changes,
+        settings.MATRIX_CACHE_TTL seconds at most: the other processes only see the change then with a local cache.
+        """
+        matrix = cache.get(self.matrix_cache_key(self.id))
+        if matrix is None:
+            organizations, requirements, grid = {}, {}, {}
+            for organization_id, organization, requirement_id, name, title, status, applicable in (
+                    Conformity.objects
+                    .filter(requirement__framework=self, requirement__level=1)
+                    .order_by('organization__name', 'requirement__tree_id', 'requirement__lft')
+                    .values_list('organization_id', 'organization__name', 'requirement_id',
+                                 'requirement__name', 'requirement__title', 'status', 'applicable')):
+                organizations[organization_id] = organization
+                requirements[requirement_id] = (name, title)
+                grid[(organization_id, requirement_id)] = (status, applicable)
+            matrix = (list(organizations.items()),
+                      [(requirement_id, name, title) for requirement_id, (name, title) in requirements.items()],
+                      grid)
+            cache.set(self.matrix_cache_key(self.id), matrix, settings.MATRIX_CACHE_TTL)
+        return matrix
+
+    @staticmethod
+    def matrix_cache_key(framework_id):
+        return f"conformity:framework:{framework_id}:matrix"
+
+    @staticmethod
+    def clear_matrix(framework):
+        """drop the cached comparison matrix of the Framework (instance or id)"""
+        cache.delete(Framework.matrix_cache_key(getattr(framework, 'pk', framework)))
+
 
 class Organization(models.Model):
     """
@@ -125,24 +216,42 @@ class Organization(models.Model):
         """return all Framework applicable to the Organization"""
         return self.applicable_frameworks.all()
 
+    def get_framework_scores(self):
+        """
+        Return the (Framework, FrameworkScore) of every applicable Framework, the score is None until computed.
+        Prefetch applicable_frameworks and scores to list several Organization without per-row queries.
+        """
+        scores = {score.framework_id: score for score in self.scores.all()}
+        return [(framework, scores.get(framework.id)) for framework in self.get_frameworks()]
+
     def remove_conformity(self, pid):
         """Cascade deletion of conformity"""
         with set_actor('system'):
             requirement_set = Requirement.objects.filter(framework=pid).values_list('id', flat=True)
             Conformity.objects.filter(requirement__in=requirement_set, organization=self.id).delete()
-    
+            FrameworkScore.objects.filter(organization=self.id, framework=pid).delete()
+            Framework.clear_matrix(pid)
+
     def add_conformity(self, pid):
         """Automatic creation of conformity"""
         with set_actor('system'):
             requirement_set = Requirement.objects.filter(framework=pid)
             conformities = [Conformity(organization=self, requirement=requirement) for requirement in requirement_set]
+            for conformity in conformities:
+                conformity.set_tree(conformity.requirement)
             Conformity.objects.bulk_create(conformities)
+            FrameworkScore.refresh(self.id, pid, conformities)
 
 
-class RequirementManager(models.Manager):
+class RequirementManager(TreeManager):
     def get_by_natural_key(self, name):
         return self.get(name=name)
 
+    def rebuild(self, *args, **kwargs):
+        """Rebuild the MPTT trees, then copy the new coordinates on the Conformity (partial_rebuild rely on it)"""
+        super().rebuild(*args, **kwargs)
+        Conformity.objects.sync_tree()
+
 
 class Requirement(MPTTModel):
     """
@@ -174,7 +283,84 @@ class Requirement(MPTTModel):
         return self.get_ancestors().last()
 
 
-class Conformity(models.Model):
+class ConformityQuerySet(models.QuerySet):
+    def with_completeness(self):
+        """Annotate the number of leaf descendants (rght = lft + 1) and how many of them are evaluated"""
+        leaves = (Conformity.objects
+                  .filter(organization=OuterRef('organization'),
+                          tree_id=OuterRef('tree_id'),
+                          lft__gt=OuterRef('lft'),
+                          rght__lt=OuterRef('rght'),
+                          rght=F('lft') + 1)
+                  .order_by()
+                  .values('organization'))
+        return self.annotate(
+            leaf_number=Coalesce(Subquery(leaves.annotate(n=Count('pk')).values('n')), 0),
+            leaf_evaluated=Coalesce(Subquery(leaves.filter(status__isnull=False)
+                                             .annotate(n=Count('pk')).values('n')), 0),
+        )
+
+    def with_evidence(self, titles=False):
+        """
+        Annotate the number of active Action and of Control of each Conformity.
+        With `titles`, also prefetch them in `action_list` and `control_list` (used by get_action and get_control).
+        """
+        actions = (Action.objects
+                   .filter(associated_conformity=OuterRef('pk'), active=True)
+                   .order_by()
+                   .values('associated_conformity'))
+        controls = (Control.objects
+                    .filter(conformity=OuterRef('pk'))
+                    .order_by()
+                    .values('conformity'))
+        queryset = self.annotate(
+            action_count=Coalesce(Subquery(actions.annotate(n=Count('pk')).values('n')), 0),
+            control_count=Coalesce(Subquery(controls.annotate(n=Count('pk')).values('n')), 0),
+        )
+        if titles:
+            queryset = queryset.prefetch_related(
+                Prefetch('actions', queryset=Action.objects.filter(active=True),
+                         to_attr='action_list'),
+                Prefetch('control_set', queryset=Control.objects.all(), to_attr='control_list'),
+            )
+        return queryset
+
+    def with_negative_evidence(self, when=None):
+        """
+        Annotate `negative_evidence`: an Action in progress or an unsuccessful ControlPoint of the current period
+        exists for the Conformity (same rule as get_related(negative_only=True)), as two EXISTS subqueries.
+        """
+        when = when or date.today()
+        actions = Action.objects.filter(
+            associated_conformity=OuterRef('pk'),
+            status__in=[Action.Status.ANALYSING, Action.Status.PLANNING,
+                        Action.Status.IMPLEMENTING, Action.Status.CONTROLLING],
+        )
+        control_points = ControlPoint.objects.filter(
+            control__conformity=OuterRef('pk'),
+            period_start_date__lte=when,
+            period_end_date__gte=when,
+            status__in=[ControlPoint.Status.NONCOMPLIANT, ControlPoint.Status.MISSED,
+                        ControlPoint.Status.SCHEDULED, ControlPoint.Status.TOBEEVALUATED],
+        )
+        return self.annotate(negative_evidence=Exists(actions) | Exists(control_points))
+
+    def sync_tree(self):
+        """Copy the MPTT coordinates of their Requirement on the Conformity that are out of sync"""
+        requirement = Requirement.objects.filter(pk=OuterRef('requirement')).order_by()
+        return (self.filter(requirement__isnull=False)
+                .filter(Q(tree_id__isnull=True)
+                        | ~Q(tree_id=F('requirement__tree_id'))
+                        | ~Q(lft=F('requirement__lft'))
+                        | ~Q(rght=F('requirement__rght'))
+                        | ~Q(level=F('requirement__level')))
+                .update(tree_id=Subquery(requirement.values('tree_id')),
+                        lft=Subquery(requirement.values('lft')),
+                        rght=Subquery(requirement.values('rght')),
+                        level=Subquery(requirement.values('level'))))
+
+
+class Conformity(DirtyFieldsMixin, models.Model):
     """
     Conformity represent the conformity of an Organization to a Requirement.
     Value are automatically update for parent requirement conformity
@@ -187,6 +373,7 @@ class Conformity(models.Model):
         FINDING = 'FIN', _('From an audit finding')
         CONFORMITY = 'CONF', _('From conformity aggregation')
 
+    objects = ConformityQuerySet.as_manager()
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, null=True)
     requirement = models.ForeignKey(Requirement, on_delete=models.CASCADE, null=True)
     applicable = models.BooleanField(default=True)
@@ -200,12 +387,18 @@ class Conformity(models.Model):
         default=StatusJustification.EXPERT,
         blank=True,
     )
+    # Copy of the Requirement MPTT coordinates, so hierarchy walks are range scans on this table only
+    tree_id = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    lft = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    rght = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    level = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
-        ordering = ['organization', 'requirement__framework', 'requirement__tree_id', 'requirement__lft']
+        ordering = ['organization', 'requirement__framework', 'tree_id', 'lft']
         verbose_name = 'Conformity'
         verbose_name_plural = 'Conformities'
         unique_together = (('organization', 'requirement'),)
+        indexes = [models.Index(fields=['organization', 'tree_id', 'lft'])]
 
     def __str__(self):
         return "[" + str(self.organization) + "] " + str(self.requirement)
@@ -215,19 +408,32 @@ class Conformity(models.Model):
 
     natural_key.dependencies = ['conformity.framework', 'conformity.requirement', 'conformity.organization']
 
+    def set_tree(self, requirement):
+        """Copy the MPTT coordinates of the Requirement on this Conformity"""
+        self.tree_id = requirement.tree_id
+        self.lft = requirement.lft
+        self.rght = requirement.rght
+        self.level = requirement.level
+
+    def is_leaf_node(self):
+        return self.rght == self.lft + 1
+
     def get_leaf(self):
         """Get all leaf from a node"""
-        return [n for n in self.get_descendants() if n.requirement.is_leaf_node()]
+        return self.get_descendants().filter(rght=F('lft') + 1)
 
     def get_completeness(self):
-        leaves = self.get_leaf() or []
-        total = len(self.get_leaf())
-        if total ==0:
+        """Return the percentage of evaluated leaves, from the with_completeness() annotation when available"""
+        if not hasattr(self, 'leaf_number'):
+            agg = self.get_leaf().aggregate(leaf_number=Count('pk'),
+                                            leaf_evaluated=Count('pk', filter=Q(status__isnull=False)))
+            self.leaf_number = agg['leaf_number']
+            self.leaf_evaluated = agg['leaf_evaluated']
+
+        if self.leaf_number == 0:
             return 0
 
-        complete = sum(1 for n in leaves if n.status is not None)
-
-        return round( (complete / total) * 100)
+        return round((self.leaf_evaluated / self.leaf_number) * 100)
 
     def get_absolute_url(self):
         """Return the absolute URL of the class for Form, probably not the best way to do it"""
@@ -237,64 +443,84 @@ class Conformity(models.Model):
     def get_descendants(self):
         """Return all children Conformity based on Requirement hierarchy"""
         return (Conformity.objects
-                .filter(organization=self.organization,
-                        requirement__in=self.requirement.get_descendants()))
+                .filter(organization=self.organization_id, tree_id=self.tree_id,
+                        lft__gt=self.lft, rght__lt=self.rght))
 
-    def get_children(self):
-        """Return all children Conformity based on Requirement hierarchy"""
+    def get_ancestors(self):
+        """Return all parent Conformity based on Requirement hierarchy"""
         return (Conformity.objects
-                .filter(organization=self.organization,
-                        requirement__in=self.requirement.get_children()))
+                .filter(organization=self.organization_id, tree_id=self.tree_id,
+                        lft__lt=self.lft, rght__gt=self.rght))
+
+    def get_children(self):
+        """
+        Return all children Conformity based on Requirement hierarchy,
+        as the list linked by cache_tree_children() when the tree was loaded at once.
+        """
+        if hasattr(self, '_cached_children'):
+            return self._cached_children
+        return self.get_descendants().filter(level=self.level + 1)
+
+    @staticmethod
+    def cache_tree_children(conformities):
+        """
+        Link in memory a list of Conformity ordered by (tree_id, lft), the same way mptt cache_tree_children
+        does for Requirement, so get_children() no longer hit the database. Return the root nodes of the list.
+        """
+        by_requirement = {}
+        roots = []
+        for c in conformities:
+            c._cached_children = []
+            by_requirement[c.requirement_id] = c
+            parent = by_requirement.get(c.requirement.parent_id)
+            if parent is None:
+                roots.append(c)
+            else:
+                parent._cached_children.append(c)
+        return roots
+
     def get_parent(self):
         """Return the parent Conformity based on Requirement hierarchy"""
-        req_parent = self.requirement.get_parent()
-        if not req_parent:
+        if not self.level:
             return None
-        return (Conformity.objects
-                .filter(organization=self.organization, requirement=req_parent)
-                .first())
+        return self.get_ancestors().filter(level=self.level - 1).first()
 
     def get_action(self):
         """Return the list of Action associated with this Conformity"""
+        if hasattr(self, 'action_list'):
+            return self.action_list
         return Action.objects.filter(associated_conformity=self.id).filter(active=True)
 
     def get_control(self):
         """Return the list of Control associated with this Conformity"""
+        if hasattr(self, 'control_list'):
+            return self.control_list
         return Control.objects.filter(conformity=self.id)
 
-    def get_related(self,*,include_actions: bool = True,include_controls: bool = True,
-            only_active: bool = False,negative_only: bool = False,
-            sort: Literal["type_then_title", "recent_first", "alpha"] = "type_then_title",
-            ) -> List[Tuple[Literal["action", "control", "controlpoint"], object]]:
+    def get_related_rows(self, *, include_actions: bool = True, include_controls: bool = True,
+                         only_active: bool = False, negative_only: bool = False,
+                         sort: Literal["type_then_title", "recent_first", "alpha"] = "type_then_title",
+                         limit: int | None = None, offset: int = 0,
+                         ) -> List[Tuple[Literal["action", "control", "controlpoint"], int, str, date | None]]:
         """
-        Return a flat list of (kind, instance).
-
-        Modes:
-          - Default (negative_only=False):
-              * 'action'  -> all actions (optionally filtered by only_active -> active=True)
-              * 'control' -> Control objects (no 'active' notion)
-          - Negative evidence (negative_only=True):
-              * 'action'       -> actions IN PROGRESS (non-terminated)
-              * 'controlpoint' -> current-period ControlPoints with NEGATIVE result (NONCOMPLIANT)
-                (If you consider MISSED as negative too, add it in the status filter below.)
-
-        Notes:
-          - 'only_active' affects Actions only in the default mode.
-          - Sorting tries to do something sensible across mixed kinds.
+        Return the (kind, id, label, date) rows of the related objects, as one UNION ALL query
+        sorted and sliced by the database. See get_related for the modes.
         """
-        items: List[Tuple[Literal["action", "control", "controlpoint"], object]] = []
-
+        def _rows(queryset, kind, label, day):
+            return (queryset
+                    .order_by()
+                    .annotate(kind=Value(kind), label=label, day=day)
+                    .values_list('kind', 'id', 'label', 'day'))
+
+        no_date = Value(None, output_field=models.DateField())
+        parts = []
         if not negative_only:
             # ---------- default mode ----------
             if include_actions:
                 actions_qs = self.actions.filter(active=True) if only_active else self.actions.all()
-                for a in actions_qs:
-                    items.append(("action", a))
-
+                parts.append(_rows(actions_qs, "action", F('title'), F('update_date')))
             if include_controls:
-                for c in self.get_control():
-                    items.append(("control", c))
-
+                parts.append(_rows(Control.objects.filter(conformity=self), "control", F('title'), no_date))
         else:
             # ---------- negative-only mode ----------
             if include_actions:
@@ -306,95 +532,190 @@ class Conformity(models.Model):
                         Action.Status.CONTROLLING,
                     ]
                 )
-                for a in actions_qs:
-                    items.append(("action", a))
-
+                parts.append(_rows(actions_qs, "action", F('title'), F('update_date')))
             if include_controls:
                 today = date.today()
                 cps = ControlPoint.objects.filter(
                     control__conformity=self,
                     period_start_date__lte=today,
                     period_end_date__gte=today,
-                    status__in=[ControlPoint.Status.NONCOMPLIANT,ControlPoint.Status.MISSED,
-                                ControlPoint.Status.SCHEDULED,ControlPoint.Status.TOBEEVALUATED],
+                    status__in=[ControlPoint.Status.NONCOMPLIANT, ControlPoint.Status.MISSED,
+                                ControlPoint.Status.SCHEDULED, ControlPoint.Status.TOBEEVALUATED],
                 )
+                parts.append(_rows(cps, "controlpoint", F('control__title'), F('period_end_date')))
 
-                for cp in cps:
-                    items.append(("controlpoint", cp))
+        if not parts:
+            return []
+        rows = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
 
         # ---------- sorting ----------
-        def _label(obj):
-            # Try common fields, fallback to __str__
-            return (
-                    getattr(obj, "title", None)
-                    or getattr(obj, "name", None)
-                    or getattr(obj, "short_description", None)
-                    or str(obj)
-            )
-
         if sort == "type_then_title":
-            order_kind = {"action": 0, "control": 1, "controlpoint": 2}
-            items.sort(key=lambda t: (order_kind.get(t[0], 99), _label(t[1])))
-
+            # kinds sort alphabetically in the expected order: action, control, controlpoint
+            rows = rows.order_by('kind', 'label', 'id')
         elif sort == "recent_first":
-            # Use whatever "date-ish" we can find: update_date for Action, period_end_date for CP, fallback very old
-            def _updated(obj):
-                return (
-                        getattr(obj, "update_date", None)
-                        or getattr(obj, "period_end_date", None)
-                        or date.min
-                )
-
-            items.sort(key=lambda t: (_updated(t[1]), _label(t[1])), reverse=True)
-
+            rows = rows.order_by(F('day').desc(nulls_last=True), F('label').desc(), '-id')
         elif sort == "alpha":
-            items.sort(key=lambda t: _label(t[1]))
+            rows = rows.order_by('label', 'kind', 'id')
+
+        if limit is not None:
+            rows = rows[offset:offset + limit]
+        elif offset:
+            rows = rows[offset:]
+        return list(rows)
+
+    def get_related(self, *, include_actions: bool = True, include_controls: bool = True,
+                    only_active: bool = False, negative_only: bool = False,
+                    sort: Literal["type_then_title", "recent_first", "alpha"] = "type_then_title",
+                    limit: int | None = None, offset: int = 0,
+                    ) -> List[Tuple[Literal["action", "control", "controlpoint"], object]]:
+        """
+        Return a flat list of (kind, instance).
 
-        return items
+        Modes:
+          - Default (negative_only=False):
+              * 'action'  -> all actions (optionally filtered by only_active -> active=True)
+              * 'control' -> Control objects (no 'active' notion)
+          - Negative evidence (negative_only=True):
+              * 'action'       -> actions IN PROGRESS (non-terminated)
+              * 'controlpoint' -> current-period ControlPoints not successful (NONCOMPLIANT, MISSED or pending)
+                (To change the statuses considered negative, edit the ControlPoint status filter of
+                get_related_rows, and the same filter of ConformityQuerySet.with_negative_evidence.)
+
+        Notes:
+          - 'only_active' affects Actions only in the default mode.
+          - The rows are sorted and sliced (limit/offset) by get_related_rows, only the page is hydrated.
+          - With the action_list and control_list prefetched by with_evidence(titles=True), the active actions
+            and the controls are sorted in memory, without query.
+        """
+        prefetched = (hasattr(self, 'action_list') or not include_actions) and \
+            (hasattr(self, 'control_list') or not include_controls)
+        if prefetched and not negative_only and (only_active or not include_actions):
+            rows = []
+            if include_actions:
+                rows += [("action", a, a.title, a.update_date) for a in self.action_list]
+            if include_controls:
+                rows += [("control", c, c.title, None) for c in self.control_list]
+            # Same order as get_related_rows
+            if sort == "type_then_title":
+                rows.sort(key=lambda row: (row[0], row[2], row[1].pk))
+            elif sort == "recent_first":
+                rows.sort(key=lambda row: (row[3] is not None, row[3] or date.min, row[2], row[1].pk), reverse=True)
+            elif sort == "alpha":
+                rows.sort(key=lambda row: (row[2], row[0], row[1].pk))
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            return [(kind, instance) for kind, instance, _, _ in rows]
+
+        rows = self.get_related_rows(include_actions=include_actions, include_controls=include_controls,
+                                     only_active=only_active, negative_only=negative_only,
+                                     sort=sort, limit=limit, offset=offset)
+        models_by_kind = {"action": Action, "control": Control, "controlpoint": ControlPoint}
+        instances = {}
+        for kind, model in models_by_kind.items():
+            ids = [pk for k, pk, _, _ in rows if k == kind]
+            if ids:
+                instances[kind] = model.objects.in_bulk(ids)
+        return [(kind, instances[kind][pk]) for kind, pk, _, _ in rows]
 
     def update_responsible(self):
-        """Update the responsible in the descendants when added"""
-        Conformity.objects.filter(
-            organization=self.organization,
-            requirement__in=self.requirement.get_descendants()
-        ).update(responsible=self.responsible)
+        """
+        Update the responsible in the descendants when added.
+        The update sends no post_save: drop the dashboard of the previous and new responsible here.
+        """
+        from . import dashboard  # dashboard imports the models
 
-    def update_status(self):
-        """Update this node's conformity status and propagate update to its parent."""
-        with set_actor('system'):
-            agg = (Conformity.objects.filter(
-                    organization=self.organization,
-                    requirement__parent=self.requirement,
-                    applicable=True,
-                    status__range=(0, 100),
-                ).aggregate(mean_status=models.Avg("status"))
-            )
+        descendants = self.get_descendants()
+        previous = set(descendants.values_list('responsible', flat=True).distinct())
+        descendants.update(responsible=self.responsible)
+        dashboard.clear_users(self.responsible_id, *previous)
 
-            if agg["mean_status"] is not None:
-                self.status = agg["mean_status"]
-                self.status_justification = Conformity.StatusJustification.CONFORMITY
-                self.status_last_update = timezone.now()
-                self.save(update_fields=['status', 'status_justification', 'status_last_update'])
+    @staticmethod
+    def recompute_status(organization, framework, requirements=None):
+        """
+        Recompute the aggregated status of the (organization, framework) conformity tree.
+
+        The whole tree is loaded with a single query ordered by (tree_id, lft); walking it backward
+        visits every child before its parent, so each parent mean is computed in one post-order pass.
+        If `requirements` is given, only those nodes and their ancestors are recomputed.
+        Only the rows whose value actually changed are written back, with a single bulk_update,
+        then the FrameworkScore of the tree is refreshed from the same nodes.
+        Return the list of updated Conformity.
+        """
+        nodes = list(Conformity.objects
+                     .filter(organization=organization, requirement__framework=framework)
+                     .order_by('tree_id', 'lft'))
+
+        # In (tree_id, lft) order, the parent of a node is the last opened node still enclosing it
+        by_requirement = {n.requirement_id: n for n in nodes}
+        parents = {}
+        children = {}
+        stack = []
+        for n in nodes:
+            while stack and (stack[-1].tree_id != n.tree_id or stack[-1].rght < n.lft):
+                stack.pop()
+            parent_id = stack[-1].requirement_id if stack else None
+            parents[n.requirement_id] = parent_id
+            children.setdefault(parent_id, []).append(n)
+            stack.append(n)
+
+        if requirements is None:
+            dirty = set(by_requirement)
+        else:
+            dirty = set()
+            for requirement_id in requirements:
+                while requirement_id in by_requirement and requirement_id not in dirty:
+                    dirty.add(requirement_id)
+                    requirement_id = parents[requirement_id]
+
+        now = timezone.now()
+        updated = []
+        for n in reversed(nodes):
+            if n.requirement_id not in dirty:
+                continue
+            values = [c.status for c in children.get(n.requirement_id, [])
+                      if c.applicable and c.status is not None and 0 <= c.status <= 100]
+            if not values:
+                continue
+
+            status = int(sum(values) / len(values))
+            if n.status != status or n.status_justification != Conformity.StatusJustification.CONFORMITY:
+                n.status = status
+                n.status_justification = Conformity.StatusJustification.CONFORMITY
+                n.status_last_update = now
+                updated.append(n)
+
+        from . import dashboard  # dashboard imports the models
+
+        Conformity.objects.bulk_update(updated, ['status', 'status_justification', 'status_last_update'])
+        # bulk_update sends no post_save: drop the dashboard showing the updated nodes here
+        dashboard.clear_users(*{n.responsible_id for n in updated})
+        FrameworkScore.refresh(organization, framework, nodes)
+        return updated
 
-            parent = self.get_parent()
-            if parent:
-                parent.update_status()
+    def update_status(self):
+        """Update this node's conformity status and flush the propagation queue to its ancestors."""
+        for n in propagation.flush(self):
+            if n.pk == self.pk:
+                self.status = n.status
+                self.status_justification = n.status_justification
+                self.status_last_update = n.status_last_update
 
     def update_applicable(self):
         """Update conformity to recursively apply the non-applicable flax to all descendant"""
-        if not self.applicable and not self.requirement.is_leaf_node():
-            descendants = Conformity.objects.filter(
-                organization=self.organization,
-                requirement__in=self.requirement.get_descendants()
-            )
-            descendants.update(applicable=False)
+        if not self.applicable and not self.is_leaf_node():
+            self.get_descendants().update(applicable=False)
 
-        elif self.applicable and self.requirement.is_child_node():
-            ancestors = Conformity.objects.filter(
-                organization=self.organization,
-                requirement__in=self.requirement.get_ancestors()
-            )
-            ancestors.update(applicable=True)
+        elif self.applicable and self.level:
+            self.get_ancestors().update(applicable=True)
+
+    def has_negative_evidence(self) -> bool:
+        """Return True when an Action in progress or a negative current ControlPoint exists, in one query"""
+        if hasattr(self, 'negative_evidence'):
+            return self.negative_evidence
+        return (Conformity.objects
+                .filter(pk=self.pk)
+                .with_negative_evidence()
+                .values_list('negative_evidence', flat=True)
+                .get())
 
     def set_status_from(self, value: int, justification: "Conformity.StatusJustification"):
         """Single point to update status + provenance + timestamp."""
@@ -402,11 +723,11 @@ class Conformity(models.Model):
         if not changed:
             return False
 
-        if justification == Conformity.StatusJustification.EXPERT and not self.requirement.is_leaf_node():
+        if justification == Conformity.StatusJustification.EXPERT and not self.is_leaf_node():
             return False
 
         if justification in [Conformity.StatusJustification.ACTION, Conformity.StatusJustification.CONTROL]:
-            negatives_exist = bool(self.get_related(negative_only=True))
+            negatives_exist = self.has_negative_evidence()
             if value == 0 and not negatives_exist:
                 return False
             if value == 100 and negatives_exist:
@@ -417,9 +738,148 @@ class Conformity(models.Model):
         self.status_justification = justification
         self.status_last_update = timezone.now()
         self.save()
+        propagation.mark_dirty(self)
         return True
 
 
+class FrameworkScore(models.Model):
+    """
+    FrameworkScore is the materialized score of an Organization on a Framework, all its root requirements included.
+    It is refreshed by the status propagation, so dashboards read one row instead of aggregating trees.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='scores')
+    framework = models.ForeignKey(Framework, on_delete=models.CASCADE, related_name='scores')
+    status = models.IntegerField(null=True, blank=True)
+    completeness = models.IntegerField(default=0)
+    leaf_number = models.PositiveIntegerField(default=0)
+    leaf_applicable = models.PositiveIntegerField(default=0)
+    leaf_evaluated = models.PositiveIntegerField(default=0)
+    last_update = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['organization', 'framework']
+        unique_together = (('organization', 'framework'),)
+
+    def __str__(self):
+        return "[" + str(self.organization) + "] " + str(self.framework)
+
+    @staticmethod
+    def refresh(organization, framework, nodes=None):
+        """
+        Compute the score of the (organization, framework) conformity tree and upsert it with a single query.
+        `nodes` is the already loaded tree, when the caller has it.
+        """
+        organization_id = getattr(organization, 'pk', organization)
+        framework_id = getattr(framework, 'pk', framework)
+        if nodes is None:
+            nodes = list(Conformity.objects
+                         .filter(organization=organization_id, requirement__framework=framework_id)
+                         .order_by())
+
+        roots = [n.status for n in nodes if not n.level and n.status is not None]
+        leaves = [n for n in nodes if n.level and n.is_leaf_node()]
+        score = FrameworkScore(
+            organization_id=organization_id,
+            framework_id=framework_id,
+            status=int(sum(roots) / len(roots)) if roots else None,
+            leaf_number=len(leaves),
+            leaf_applicable=sum(1 for n in leaves if n.applicable),
+            leaf_evaluated=sum(1 for n in leaves if n.status is not None),
+            last_update=max((n.status_last_update for n in nodes if n.status_last_update), default=None),
+        )
+        score.completeness = round((score.leaf_evaluated / score.leaf_number) * 100) if score.leaf_number else 0
+
+        FrameworkScore.objects.bulk_create(
+            [score], update_conflicts=True, unique_fields=['organization', 'framework'],
+            update_fields=['status', 'completeness', 'leaf_number', 'leaf_applicable', 'leaf_evaluated', 'last_update'],
+        )
+        Framework.clear_matrix(framework_id)
+        return score
+
+
+class ConformityHistoryQuerySet(models.QuerySet):
+    def series(self, start=None, end=None):
+        """
+        Return the time series of every node as {(organization_id, requirement_id): [(date, status), ...]}.
+        Only the days a value changed are stored: the value in force at `start` is read in the same query.
+        """
+        rows = self
+        if start is not None:
+            in_force = (ConformityHistory.objects
+                        .filter(organization=OuterRef('organization'), requirement=OuterRef('requirement'),
+                                date__lte=start)
+                        .order_by('-date')
+                        .values('date')[:1])
+            rows = rows.filter(Q(date__gt=start) | Q(date=Subquery(in_force)))
+        if end is not None:
+            rows = rows.filter(date__lte=end)
+
+        series = {}
+        for organization_id, requirement_id, day, status in (rows
+                                                             .order_by('organization', 'requirement', 'date')
+                                                             .values_list('organization', 'requirement',
+                                                                          'date', 'status')):
+            series.setdefault((organization_id, requirement_id), []).append(
+                (max(day, start) if start is not None else day, status))
+        return series
+
+
+class ConformityHistory(models.Model):
+    """
+    ConformityHistory is the daily history of the Conformity status.
+    A row is only stored for the days the status of the (organization, requirement) node changed.
+    """
+    objects = ConformityHistoryQuerySet.as_manager()
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='history')
+    requirement = models.ForeignKey(Requirement, on_delete=models.CASCADE, related_name='history')
+    date = models.DateField()
+    status = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['organization', 'requirement', 'date']
+        unique_together = (('organization', 'requirement', 'date'),)
+        verbose_name_plural = 'conformity history'
+
+    def __str__(self):
+        return "[" + str(self.organization) + "] " + str(self.requirement) + " " + str(self.date)
+
+    @staticmethod
+    def snapshot(day=None):
+        """
+        Record the status of every Conformity on `day` (today by default) when it differs from the previous one.
+        Running it again the same day overwrites that day. Return the number of rows written.
+        """
+        day = day or timezone.localdate()
+        previous = (ConformityHistory.objects
+                    .filter(organization=OuterRef('organization'), requirement=OuterRef('requirement'),
+                            date__lt=day)
+                    .order_by('-date')
+                    .values('status')[:1])
+        today = ConformityHistory.objects.filter(organization=OuterRef('organization'),
+                                                 requirement=OuterRef('requirement'), date=day)
+        conformities = (Conformity.objects
+                        .filter(organization__isnull=False, requirement__isnull=False)
+                        .annotate(previous=Subquery(previous), recorded=Subquery(today.values('pk')[:1]))
+                        .order_by()
+                        .values_list('organization', 'requirement', 'status', 'previous', 'recorded'))
+
+        changed, unchanged = [], []
+        for organization_id, requirement_id, status, previous_status, recorded in conformities:
+            if status != previous_status:
+                changed.append(ConformityHistory(organization_id=organization_id, requirement_id=requirement_id,
+                                                 date=day, status=status))
+            elif recorded:
+                # Changed then restored during the day: the previous row is still in force
+                unchanged.append(recorded)
+
+        for i in range(0, len(unchanged), 1000):
+            ConformityHistory.objects.filter(pk__in=unchanged[i:i + 1000]).delete()
+        ConformityHistory.objects.bulk_create(changed, batch_size=1000, update_conflicts=True,
+                                              unique_fields=['organization', 'requirement', 'date'],
+                                              update_fields=['status'])
+        return len(changed)
+
+
 class Audit(models.Model):
     """
     Audit class represent the auditing event, on an Organization.
@@ -517,6 +977,21 @@ class Audit(models.Model):
         return Finding.objects.filter(audit=self.id).filter(severity=Finding.Severity.OTHER)
 
 
+class FindingQuerySet(models.QuerySet):
+    def refresh_archived(self, ids=None):
+        """
+        Set-based Finding.update_archived: archived when the Finding has Action and none of them is active.
+        `ids` may be a list or a subquery of Finding ids, all the Finding of the queryset by default.
+        Only the rows whose flag changes are written, with two UPDATE. Return the number of updated Finding.
+        """
+        findings = self if ids is None else self.filter(pk__in=ids)
+        has_action = Exists(Action.objects.filter(associated_findings=OuterRef('pk')))
+        has_active = Exists(Action.objects.filter(associated_findings=OuterRef('pk'), active=True))
+        archived = findings.filter(archived=False).filter(has_action).exclude(has_active).update(archived=True)
+        restored = findings.filter(archived=True).filter(~has_action | has_active).update(archived=False)
+        return archived + restored
+
+
 class Finding(models.Model):
     """
     Finding class represent the element discover during and Audit.
@@ -531,6 +1006,7 @@ class Finding(models.Model):
         POSITIVE = 'POS', _('Positive finding')
         OTHER = 'OTHER', _('Other comment')
 
+    objects = FindingQuerySet.as_manager()
     name = models.CharField(max_length=256, blank=True)
     short_description = models.CharField(max_length=256)
     description = models.TextField(max_length=4096, blank=True)
@@ -594,7 +1070,7 @@ class Finding(models.Model):
             self.save(update_fields=["archived"])
 
 
-class Control(models.Model):
+class Control(DirtyFieldsMixin, models.Model):
     """
     Control class represent the periodic control needed to verify the security and the effectiveness of the security requirement.
     """
@@ -606,6 +1082,7 @@ class Control(models.Model):
         QUARTERLY = '4', _('Quarterly')
         BIMONTHLY = '6', _('Bimonthly')
         MONTHLY = '12', _('Monthly')
+        WEEKLY = '52', _('Weekly')
 
     class Level(models.IntegerChoices):
         """ List of control level possible for a control """
@@ -625,6 +1102,8 @@ class Control(models.Model):
         choices=Level.choices,
         default=Level.FIRST,
     )
+    schedule_anchor = models.DateField(null=True, blank=True,
+                                       help_text=_("Start of a period, January 1st (a Monday for weekly) by default"))
 
     class Meta:
         ordering = ['level','frequency','title']
@@ -639,32 +1118,97 @@ class Control(models.Model):
 
     @staticmethod
     def controlpoint_bootstrap(instance):
-        ControlPoint.objects.filter(control=instance.id).filter(Q(status='SCHD') | Q(status='TOBE')).delete()
-
-        num_cp = instance.frequency
+        """Generate the ControlPoint of the current year. Return the (created, deleted) numbers of points."""
         today = date.today()
-        start_date = date(today.year, 1, 1)
-        delta = timedelta(days=365 // num_cp - 2)
-        end_date = start_date + delta
-        for _ in range(num_cp):
-            period_start_date = date(start_date.year, start_date.month, 1)
-            period_end_date = date(end_date.year, end_date.month, monthrange(end_date.year, end_date.month)[1])
-            if not ControlPoint.objects.filter(control=instance.id).filter(period_start_date=period_start_date).filter(period_end_date=period_end_date) :
-                ControlPoint.objects.create(
-                    control=instance,
-                    period_start_date=period_start_date,
-                    period_end_date=period_end_date,
-                )
-            start_date = period_end_date + timedelta(days=1)
-            end_date = start_date + delta - timedelta(days=1)
+        periods = schedule.year_periods(instance.frequency, today.year, instance.schedule_anchor)
+        return schedule.sync(ControlPoint, 'control', instance, periods, prepare=ControlPoint.update_status,
+                             today=today)
 
+    @staticmethod
+    def extend_schedules(ahead, today=None):
+        """Create the missing ControlPoint of every Control up to `ahead` periods after today, in bulk"""
+        today = today or date.today()
+        schedules = {pk: schedule.periods_ahead(frequency, today, ahead, anchor)
+                     for pk, frequency, anchor in Control.objects.values_list('pk', 'frequency', 'schedule_anchor')}
+        return schedule.extend(ControlPoint, 'control', schedules, prepare=ControlPoint.update_status)
 
     def get_controlpoint(self):
         """Return all control point based on this control"""
-        return ControlPoint.objects.filter(control=self).order_by('period_start_date')
+        return ControlPoint.objects.filter(control=self).with_effective_status().order_by('period_start_date')
 
 
-class ControlPoint(models.Model):
+class PeriodicPointQuerySet(models.QuerySet):
+    """
+    QuerySet of the ControlPoint and IndicatorPoint. Their stored status only holds the evaluation results,
+    the Scheduled / To evaluate / Missed statuses of the points not evaluated (stored as SCHD) derive from the
+    current date and their period.
+    """
+    # Stored status of the points not evaluated yet
+    PENDING = ('SCHD', 'TOBE')
+
+    def with_effective_status(self, today=None):
+        """Annotate the effective_status of the points at `today`"""
+        today = today or date.today()
+        pending = Q(status__in=self.PENDING)
+        return self.annotate(effective_status=Case(
+            When(pending & Q(period_end_date__lt=today), then=Value('MISS')),
+            When(pending & Q(period_start_date__lte=today), then=Value('TOBE')),
+            When(pending, then=Value('SCHD')),
+            default=F('status'),
+            output_field=CharField(),
+        ))
+
+    def effective(self, *statuses, today=None):
+        """
+        Filter the points on their effective status at `today`, with predicates on (status, period) that use
+        the composite index instead of the annotation.
+        """
+        return self.filter(self.effective_q(*statuses, today=today))
+
+    @classmethod
+    def effective_q(cls, *statuses, today=None):
+        """Return the condition of an effective status in `statuses`, e.g. for a Count(filter=...)"""
+        today = today or date.today()
+        pending = Q(status__in=cls.PENDING)
+        predicates = {
+            'SCHD': pending & Q(period_start_date__gt=today),
+            'TOBE': pending & Q(period_start_date__lte=today, period_end_date__gte=today),
+            'MISS': Q(status='MISS') | (pending & Q(period_end_date__lt=today)),
+        }
+        condition = Q(pk__in=[])
+        for status in statuses:
+            condition |= predicates.get(status, Q(status=status))
+        return condition
+
+
+class PeriodicPointMixin:
+    """effective_status of a ControlPoint or IndicatorPoint, from the annotation when it is loaded"""
+
+    @property
+    def effective_status(self):
+        if '_effective_status' in self.__dict__:
+            return self._effective_status
+        return self.get_effective_status()
+
+    @effective_status.setter
+    def effective_status(self, value):
+        self._effective_status = value
+
+    def get_effective_status(self, today=None):
+        if self.status not in PeriodicPointQuerySet.PENDING:
+            return self.status
+        today = today or date.today()
+        if self.period_end_date < today:
+            return self.Status.MISSED.value
+        if self.period_start_date <= today:
+            return self.Status.TOBEEVALUATED.value
+        return self.Status.SCHEDULED.value
+
+    def get_effective_status_display(self):
+        return self.Status(self.effective_status).label
+
+
+class ControlPoint(PeriodicPointMixin, DirtyFieldsMixin, models.Model):
     """
     A control point is a specific point of verification of a periodic Control.
     """
@@ -686,8 +1230,12 @@ class ControlPoint(models.Model):
     comment = models.TextField(max_length=4096, blank=True)
     attachment = models.ManyToManyField('Attachment', blank=True, related_name='ControlPoint')
 
+    objects = PeriodicPointQuerySet.as_manager()
+
     class Meta:
         ordering = ['period_end_date']
+        indexes = [models.Index(fields=['status', 'period_start_date', 'period_end_date'],
+                                name='controlpoint_status_period')]
 
     @staticmethod
     def get_absolute_url():
@@ -696,14 +1244,9 @@ class ControlPoint(models.Model):
 
     @staticmethod
     def update_status(instance):
+        """Only store the evaluation results, the other status derive from the date (see effective_status)"""
         if instance.status != ControlPoint.Status.COMPLIANT and instance.status != ControlPoint.Status.NONCOMPLIANT:
-            today = date.today()
-            if instance.period_end_date < today:
-                instance.status = ControlPoint.Status.MISSED
-            elif instance.period_start_date <= today <= instance.period_end_date:
-                instance.status = ControlPoint.Status.TOBEEVALUATED
-            else:
-                instance.status = ControlPoint.Status.SCHEDULED
+            instance.status = ControlPoint.Status.SCHEDULED
 
     def __str__(self):
         return "[" + str(self.control.organization) + "] " + self.control.title + " (" \
@@ -722,7 +1265,7 @@ class ControlPoint(models.Model):
         return self.status in (ControlPoint.Status.COMPLIANT, ControlPoint.Status.NONCOMPLIANT)
 
 
-class Action(models.Model):
+class Action(DirtyFieldsMixin, models.Model):
     """
     Action class represent the actions taken by the Organization to improve security.
     """
@@ -823,29 +1366,113 @@ class Action(models.Model):
 
 
 class Attachment(models.Model):
+    # Number of leading bytes given to libmagic to guess the mime type
+    MIME_HEADER_SIZE = 2048
+    # Directory of the content addressed files, named by their SHA-256
+    BLOB_DIR = 'attachments/blobs'
+
     file = models.FileField(upload_to='attachments/')
+    name = models.CharField(max_length=255, blank=True)
     comment = models.TextField(max_length=4096, blank=True)
     mime_type = models.CharField(max_length=255, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    size = models.PositiveBigIntegerField(blank=True, null=True)
+    preview = models.FileField(upload_to='attachments/', blank=True)
+    snippet = models.TextField(blank=True)
+    preview_date = models.DateTimeField(blank=True, null=True)
     create_date = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-create_date', 'file']
 
     def __str__(self):
-        return self.file.name.split("/")[1]
+        return self.name or self.file.name.split("/")[1]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_magic():
+        """Return the Magic instance of the process, loading the libmagic database is costly"""
+        return Magic(mime=True)
 
     @staticmethod
     def autoset_mimetype(instance):
-        # Read file and set mime_type
-        file_content = instance.file.read()
+        """
+        Set the mime_type, sha256 and size of a new file in one streaming pass:
+        the file is read by chunks and only its header is given to libmagic.
+        """
+        if instance.file._committed and instance.sha256:
+            return
+
+        digest, size, header = hashlib.sha256(), 0, b''
+        for chunk in instance.file.chunks():
+            if len(header) < Attachment.MIME_HEADER_SIZE:
+                header += chunk[:Attachment.MIME_HEADER_SIZE - len(header)]
+            digest.update(chunk)
+            size += len(chunk)
         instance.file.seek(0)
-        mime = Magic(mime=True)
-        instance.mime_type = mime.from_buffer(file_content)
+
+        instance.mime_type = Attachment.get_magic().from_buffer(header)
+        instance.sha256 = digest.hexdigest()
+        instance.size = size
+        if not instance.name:
+            instance.name = os.path.basename(instance.file.name)
 
         # TODO filter on mime type
 
+    @staticmethod
+    def blob_name(sha256):
+        return f"{Attachment.BLOB_DIR}/{sha256[:2]}/{sha256}"
+
+    def save(self, *args, **kwargs):
+        """Save in a transaction, to hold the lock taken by store_blob until the row is written"""
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
+    @staticmethod
+    def store_blob(instance):
+        """
+        Point a new uploaded file to the content addressed file of its SHA-256 (see autoset_mimetype).
+        The file is reused only while a saved Attachment refers to it: that row is locked until the new one is
+        saved, so the deletion of the last reference waits and its release (see release_files) sees the new row.
+        Otherwise the file may be released at any time, and the content is written again (under another name
+        when the released file is still there), as it is when the shared file is missing.
+        """
+        if instance.file._committed:
+            return
+        name = Attachment.blob_name(instance.sha256)
+        storage = instance.file.storage
+        referenced = Attachment.objects.select_for_update().filter(file=name).values_list('pk', flat=True)[:1]
+        if not list(referenced) or not storage.exists(name):
+            instance.file.seek(0)
+            name = storage.save(name, instance.file.file, max_length=instance.file.field.max_length)
+        instance.file = name
+
+    def references(self):
+        """Return the number of Attachment sharing the stored file"""
+        return Attachment.objects.filter(sha256=self.sha256, file=self.file.name).count()
+
+    @staticmethod
+    def release_files(instance):
+        """
+        Delete the stored file and preview of a deleted Attachment, once no other Attachment refers to them.
+        Content addressed files and previews are shared by the identical uploads, the other files are not.
+        """
+        storage = instance.file.storage
+        names = [('file', instance.file.name), ('preview', instance.preview.name)]
+        if instance.file.name and instance.file.name.startswith(f"{Attachment.BLOB_DIR}/"):
+            names.append(('preview', f"{instance.file.name}.preview.png"))
+        names = [(field, name) for field, name in names if name]
+        if not names:
+            return
 
-class Indicator (models.Model):
+        def release():
+            for field, name in names:
+                if not Attachment.objects.filter(**{field: name}).exists():
+                    storage.delete(name)
+        transaction.on_commit(release)
+
+
+class Indicator (DirtyFieldsMixin, models.Model):
     """ Indicator used to measure risk level or performance """
 
     class Frequency(models.IntegerChoices):
@@ -855,6 +1482,7 @@ class Indicator (models.Model):
         QUARTERLY = 4, _('Quarterly')
         BIMONTHLY = 6, _('Bimonthly')
         MONTHLY = 12, _('Monthly')
+        WEEKLY = 52, _('Weekly')
 
     name = models.CharField(max_length=256)
     goal = models.TextField(max_length=4096, blank=True)
@@ -871,6 +1499,8 @@ class Indicator (models.Model):
         choices=Frequency.choices,
         default=Frequency.QUARTERLY,
     )
+    schedule_anchor = models.DateField(null=True, blank=True,
+                                       help_text=_("Start of a period, January 1st (a Monday for weekly) by default"))
 
     @staticmethod
     def get_absolute_url():
@@ -878,24 +1508,18 @@ class Indicator (models.Model):
         return reverse('conformity:indicator_index')
 
     def indicator_point_init(self):
-        IndicatorPoint.objects.filter(indicator=self).filter(Q(status='SCHD') | Q(status='TOBE')).delete()
-
-        num_cp = self.frequency
+        """Generate the IndicatorPoint of the current year. Return the (created, deleted) numbers of points."""
         today = date.today()
-        start_date = date(today.year, 1, 1)
-        delta = timedelta(days=365 // num_cp - 2)
-        end_date = start_date + delta
-        for _ in range(num_cp):
-            period_start_date = date(start_date.year, start_date.month, 1)
-            period_end_date = date(end_date.year, end_date.month, monthrange(end_date.year, end_date.month)[1])
-            if not IndicatorPoint.objects.filter(indicator=self, period_start_date=period_start_date, period_end_date=period_end_date).exists() :
-                IndicatorPoint.objects.create(
-                    indicator=self,
-                    period_start_date=period_start_date,
-                    period_end_date=period_end_date,
-                )
-            start_date = period_end_date + timedelta(days=1)
-            end_date = start_date + delta - timedelta(days=1)
+        periods = schedule.year_periods(self.frequency, today.year, self.schedule_anchor)
+        return schedule.sync(IndicatorPoint, 'indicator', self, periods, today=today)
+
+    @staticmethod
+    def extend_schedules(ahead, today=None):
+        """Create the missing IndicatorPoint of every Indicator up to `ahead` periods after today, in bulk"""
+        today = today or date.today()
+        schedules = {pk: schedule.periods_ahead(frequency, today, ahead, anchor)
+                     for pk, frequency, anchor in Indicator.objects.values_list('pk', 'frequency', 'schedule_anchor')}
+        return schedule.extend(IndicatorPoint, 'indicator', schedules)
 
     def get_current_point(self):
         today = timezone.now().date()
@@ -906,7 +1530,7 @@ class Indicator (models.Model):
         )
 
 
-class IndicatorPoint(models.Model):
+class IndicatorPoint(PeriodicPointMixin, models.Model):
     """ Measurement point of an Indicator """
 
     class Status(models.TextChoices):
@@ -928,6 +1552,12 @@ class IndicatorPoint(models.Model):
     value = models.IntegerField(null=True)
     attachment = models.ManyToManyField('Attachment', blank=True, related_name='IndicatorPoint')
 
+    objects = PeriodicPointQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'period_start_date', 'period_end_date'],
+                                name='indicatorpoint_status_period')]
+
     @staticmethod
     def get_absolute_url():
         """return the absolute URL for Forms, could probably do better"""
@@ -960,3 +1590,47 @@ class IndicatorPoint(models.Model):
 
         else:
             self.status = IndicatorPoint.Status.MISSED
+
+
+class JobLease(models.Model):
+    """
+    JobLease is the last run of a daily job shared by every process of the deployment.
+    A process takes the lease with an atomic compare-and-set UPDATE, so a single one runs the job per day;
+    a lease not completed (crashed process) expires after its duration.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    last_run = models.DateField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    owner = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.last_run})"
+
+    @staticmethod
+    def is_done(name, day):
+        """Return True when the job already ran for the day"""
+        return JobLease.objects.filter(name=name, last_run__gte=day).exists()
+
+    @staticmethod
+    def acquire(name, day, duration=timedelta(minutes=15), owner=''):
+        """Take the lease of the job for the day, return False when it already ran or another process holds it"""
+        JobLease.objects.bulk_create([JobLease(name=name)], ignore_conflicts=True)
+        now = timezone.now()
+        return bool(JobLease.objects
+                    .filter(name=name)
+                    .filter(Q(last_run__isnull=True) | Q(last_run__lt=day))
+                    .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+                    .update(lease_until=now + duration, owner=owner))
+
+    @staticmethod
+    def complete(name, day):
+        """Record the run of the day and release the lease"""
+        JobLease.objects.filter(name=name).update(last_run=day, lease_until=None)
+
+    @staticmethod
+    def release(name):
+        """Release the lease without recording a run, another process may retry"""
+        JobLease.objects.filter(name=name).update(lease_until=None)
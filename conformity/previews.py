@@ -0,0 +1,143 @@
+"""
+Background generation of the Attachment previews: a small PNG thumbnail of the images and of the first page of
+the PDF, a text snippet of the text files. Previews are computed once per content, stored next to the blob
+(see Attachment.blob_name) and never require reading the original file again to browse the evidences.
+
+Jobs run in a process wide thread pool of settings.ATTACHMENT_PREVIEW_WORKERS threads, inline when it is 0.
+Thumbnails need Pillow, PDF pages the pdftoppm tool of poppler: without them only the snippets are generated.
+"""
+import logging
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.utils import timezone
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+from .models import Attachment
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+SNIPPET_LENGTH = 500
+TEXT_TYPES = ('application/json', 'application/xml', 'application/csv')
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.ATTACHMENT_PREVIEW_WORKERS,
+                                       thread_name_prefix='attachment-preview')
+    return _executor
+
+
+def submit(attachment_id):
+    """Queue the preview generation of an Attachment, or run it right away without worker"""
+    if settings.ATTACHMENT_PREVIEW_WORKERS:
+        return get_executor().submit(work, attachment_id)
+    return run(attachment_id)
+
+
+def work(attachment_id):
+    """Worker entry point: generate then release the database connection of the thread"""
+    try:
+        return run(attachment_id)
+    finally:
+        close_old_connections()
+
+
+def run(attachment_id):
+    """Generate the preview of an Attachment, a failure is logged and retried by generate_missing"""
+    try:
+        return generate(attachment_id)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Preview generation failed for attachment %s", attachment_id)
+        return None
+
+
+def preview_name(attachment):
+    """Stored name of the preview, next to the blob, shared by the attachments of the same content"""
+    base = Attachment.blob_name(attachment.sha256) if attachment.sha256 else attachment.file.name
+    return f"{base}.preview.png"
+
+
+def thumbnail(source):
+    """Return the PNG thumbnail of an image file-like object"""
+    with Image.open(source) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def pdf_thumbnail(attachment):
+    """Return the PNG thumbnail of the first page of a PDF, rendered by pdftoppm"""
+    pdftoppm = shutil.which('pdftoppm')
+    if not pdftoppm:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        with attachment.file.open('rb') as source, open(Path(tmp) / 'source.pdf', 'wb') as target:
+            shutil.copyfileobj(source, target)
+        subprocess.run([pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(max(THUMBNAIL_SIZE)),
+                        str(Path(tmp) / 'source.pdf'), str(Path(tmp) / 'page')],
+                       check=True, capture_output=True, timeout=60)
+        return (Path(tmp) / 'page.png').read_bytes()
+
+
+def snippet(attachment):
+    """Return the first characters of a text file"""
+    with attachment.file.open('rb') as source:
+        return source.read(SNIPPET_LENGTH * 4).decode('utf-8', errors='ignore')[:SNIPPET_LENGTH].strip()
+
+
+def generate(attachment_id):
+    """Compute and store the preview and snippet of an Attachment, reusing the preview of an identical content"""
+    attachment = Attachment.objects.filter(pk=attachment_id).first()
+    if attachment is None or attachment.preview_date:
+        return attachment
+
+    mime_type = attachment.mime_type or ''
+    fields = {'preview_date': timezone.now()}
+    name = preview_name(attachment)
+    storage = attachment.file.storage
+    if storage.exists(name):
+        fields['preview'] = name
+    else:
+        content = None
+        if mime_type.startswith('image/') and Image is not None:
+            with attachment.file.open('rb') as source:
+                content = thumbnail(source)
+        elif mime_type == 'application/pdf':
+            content = pdf_thumbnail(attachment)
+        if content:
+            fields['preview'] = storage.save(name, ContentFile(content))
+
+    if mime_type.startswith('text/') or mime_type in TEXT_TYPES:
+        fields['snippet'] = snippet(attachment)
+
+    # update() does not trigger the Attachment signals again
+    Attachment.objects.filter(pk=attachment_id).update(**fields)
+    attachment.refresh_from_db()
+    return attachment
+
+
+def generate_missing():
+    """Generate, in the calling thread, the previews never computed. Return their number"""
+    pending = list(Attachment.objects.filter(preview_date__isnull=True).values_list('pk', flat=True))
+    for attachment_id in pending:
+        run(attachment_id)
+    return len(pending)
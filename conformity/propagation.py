@@ -0,0 +1,121 @@
+"""
+Coalescing of the Conformity status propagation.
+Leaf updates only mark their (organization, requirement) node as dirty, the ancestors are recomputed
+once per (organization, framework) tree when the surrounding transaction or request is over.
+"""
+import threading
+import weakref
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+class PropagationQueue:
+    """Set of dirty (organization, requirement) nodes, flushed as a transaction.on_commit callback"""
+
+    def __init__(self):
+        self.nodes = set()
+
+    def __call__(self):
+        self.flush()
+
+    def flush(self):
+        nodes = set(self.nodes)
+        self.nodes.clear()
+        return recompute(nodes)
+
+
+def _current_queue(create=True):
+    """Return the queue of the current request batch or transaction, None in autocommit mode"""
+    queue = getattr(_local, 'queue', None)
+    if queue is not None:
+        return queue
+    if transaction.get_autocommit():
+        return None
+    return _pending_queue(create)
+
+
+def _pending_queue(create=True):
+    """
+    Return the queue waiting for the commit of the current transaction. Only the on_commit callbacks hold it,
+    the thread keeps a weak reference: once they ran or were discarded by a rollback, a new queue is started.
+    """
+    pending = getattr(_local, 'pending', None)
+    queue = pending() if pending is not None else None
+    if queue is None and create:
+        queue = PropagationQueue()
+        _local.pending = weakref.ref(queue)
+    return queue
+
+
+def _register(queue):
+    """
+    Flush the queue on commit. Registered on every use, so that a rolled back savepoint, which discards its own
+    callbacks, never drops the nodes queued outside of it. The extra calls find the queue empty.
+    """
+    transaction.on_commit(queue)
+    return queue
+
+
+def mark_dirty(conformity):
+    """Queue the ancestors of this Conformity for recomputation, right away in autocommit mode"""
+    node = (conformity.organization_id, conformity.requirement_id)
+    queue = _current_queue()
+    if queue is None:
+        return recompute({node})
+    queue.nodes.add(node)
+    if queue is not getattr(_local, 'queue', None):
+        _register(queue)
+    return []
+
+
+def flush(*conformities):
+    """Recompute the pending nodes and the given Conformity now. Return the updated Conformity."""
+    nodes = {(c.organization_id, c.requirement_id) for c in conformities}
+    queue = _current_queue(create=False)
+    if queue is not None:
+        nodes |= queue.nodes
+        queue.nodes.clear()
+    return recompute(nodes)
+
+
+@contextmanager
+def batch():
+    """Collect the dirty nodes until the outermost batch is left (i.e. the end of the request)"""
+    depth = getattr(_local, 'depth', 0)
+    if not depth:
+        _local.queue = PropagationQueue()
+    _local.depth = depth + 1
+    try:
+        yield _local.queue
+    finally:
+        _local.depth = depth
+        if not depth:
+            queue, _local.queue = _local.queue, None
+            if queue.nodes:
+                pending = _pending_queue()
+                pending.nodes |= queue.nodes
+                _register(pending)
+
+
+def recompute(nodes):
+    """Recompute every node and its ancestors exactly once, deepest first, grouped by conformity tree"""
+    from .models import Conformity, Requirement
+
+    if not nodes:
+        return []
+
+    frameworks = dict(Requirement.objects
+                      .filter(id__in={requirement_id for _, requirement_id in nodes})
+                      .values_list('id', 'framework_id'))
+    trees = {}
+    for organization_id, requirement_id in nodes:
+        if requirement_id in frameworks:
+            trees.setdefault((organization_id, frameworks[requirement_id]), []).append(requirement_id)
+
+    updated = []
+    for (organization_id, framework_id), requirements in trees.items():
+        updated += Conformity.recompute_status(organization_id, framework_id, requirements)
+    return updated
@@ -0,0 +1,105 @@
+"""
+Daily integrity checks: extend the schedules of the Control and Indicator, so that their upcoming points exist.
+The Scheduled / To evaluate / Missed status of the points are not written, they derive from the date
+(see PeriodicPointQuerySet.with_effective_status).
+
+The checks never run on the request path. They are run by the run_daily_checks management command (cron),
+and/or by an in-process background thread started by the WSGI entry point with settings.SANITY_CHECK_THREAD.
+Requests and logins only call enqueue() to wake that thread up.
+
+Whatever the number of processes and nodes, the checks run once a day: the last run is a JobLease row,
+taken with an atomic compare-and-set. The other processes skip with a single read, then none for the day.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Control, Indicator, JobLease
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'daily_checks'
+LEASE_DURATION = timedelta(minutes=15)
+
+_wakeup = threading.Event()
+_thread = None
+_last_run = None
+
+
+# Number of periods ahead of the current one kept scheduled
+SCHEDULE_AHEAD = 4
+
+
+def check_schedules(today):
+    """Create the missing points of the Control and Indicator schedules"""
+    Control.extend_schedules(SCHEDULE_AHEAD, today)
+    Indicator.extend_schedules(SCHEDULE_AHEAD, today)
+
+
+def run_daily_checks(today=None, force=False):
+    """
+    Performs the daily integrity checks, unless they already ran or are running elsewhere for the day.
+    Return the day checked, None when skipped. `force` runs them regardless of the lease.
+    """
+    global _last_run
+    today = today or date.today()
+    if force:
+        check_schedules(today)
+        return today
+
+    if _last_run == today:
+        return None
+    if JobLease.is_done(JOB_NAME, today):
+        _last_run = today
+        return None
+    if not JobLease.acquire(JOB_NAME, today, LEASE_DURATION, owner=f"{socket.gethostname()}:{os.getpid()}"):
+        return None
+
+    try:
+        check_schedules(today)
+    except Exception:
+        JobLease.release(JOB_NAME)
+        raise
+    JobLease.complete(JOB_NAME, today)
+    _last_run = today
+    return today
+
+
+def enqueue():
+    """Ask the background thread, when started, to run the checks not done today. Never runs them itself"""
+    if _thread is not None and _last_run != date.today():
+        _wakeup.set()
+
+
+def start():
+    """Start the background thread once per process, when enabled by settings.SANITY_CHECK_THREAD"""
+    global _thread
+    if not settings.SANITY_CHECK_THREAD or _thread is not None:
+        return _thread
+    _thread = threading.Thread(target=loop, name='sanity-check', daemon=True)
+    _thread.start()
+    return _thread
+
+
+def seconds_to_midnight():
+    now = datetime.now()
+    return (datetime.combine(now.date() + timedelta(days=1), time.min) - now).total_seconds()
+
+
+def loop():
+    """Run the checks at startup, then every midnight or when woken up by enqueue()"""
+    while True:
+        if _last_run != date.today():
+            try:
+                run_daily_checks()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Daily integrity checks failed")
+            finally:
+                close_old_connections()
+        _wakeup.wait(timeout=seconds_to_midnight() + 1)
+        _wakeup.clear()
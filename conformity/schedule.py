@@ -0,0 +1,128 @@
+"""
+Generation of the periodic schedules: ControlPoint of a Control, IndicatorPoint of an Indicator.
+
+Periods are computed from the calendar: a frequency of n points per year gives periods of 12/n months,
+52 gives weeks. Every period is derived from the anchor date (January 1st / a Monday by default),
+never from the previous one, so there is no drift whatever the number of periods generated.
+The expected periods are then diffed against the existing points read in one query:
+only the stale pending points are deleted and only the missing ones are inserted, with bulk_create.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+# Status of the points not evaluated yet, the only ones a new schedule may drop
+PENDING = ('SCHD', 'TOBE')
+
+WEEKLY = 52
+# Monday, January 1st: aligns the monthly based periods on the civil year and the weeks on Mondays
+DEFAULT_ANCHOR = date(2001, 1, 1)
+
+
+def add_months(day, months):
+    """Return the same day `months` later, on the last day of the month when it is too short"""
+    year, month = divmod(day.month - 1 + months, 12)
+    year += day.year
+    return date(year, month + 1, min(day.day, monthrange(year, month + 1)[1]))
+
+
+def period_at(frequency, day, anchor=None):
+    """Return the index and the (start, end) of the period containing `day`"""
+    anchor = anchor or DEFAULT_ANCHOR
+    if frequency == WEEKLY:
+        index = (day - anchor).days // 7
+        start = anchor + timedelta(weeks=index)
+        return index, (start, start + timedelta(days=6))
+    if frequency <= 0 or 12 % frequency:
+        raise ValueError(f"Unsupported schedule frequency: {frequency}")
+
+    months = 12 // frequency
+    index = ((day.year - anchor.year) * 12 + day.month - anchor.month) // months
+    if add_months(anchor, index * months) > day:
+        index -= 1
+    return index, period(frequency, index, anchor)
+
+
+def period(frequency, index, anchor=None):
+    """Return the (start, end) of the `index`-th period after the anchor"""
+    anchor = anchor or DEFAULT_ANCHOR
+    if frequency == WEEKLY:
+        start = anchor + timedelta(weeks=index)
+        return start, start + timedelta(days=6)
+    months = 12 // frequency
+    return add_months(anchor, index * months), add_months(anchor, (index + 1) * months) - timedelta(days=1)
+
+
+def periods_between(frequency, first, last, anchor=None):
+    """Return the periods overlapping the [first, last] days"""
+    index, _ = period_at(frequency, first, anchor)
+    periods = []
+    while True:
+        start, end = period(frequency, index, anchor)
+        if start > last:
+            return periods
+        periods.append((start, end))
+        index += 1
+
+
+def year_periods(frequency, year, anchor=None):
+    """Return the periods overlapping the civil year"""
+    return periods_between(frequency, date(year, 1, 1), date(year, 12, 31), anchor)
+
+
+def periods_ahead(frequency, day, ahead, anchor=None):
+    """Return the period containing `day` and the `ahead` following ones"""
+    index, _ = period_at(frequency, day, anchor)
+    return [period(frequency, i, anchor) for i in range(index, index + ahead + 1)]
+
+
+def sync(model, owner_field, owner, periods, prepare=None, today=None):
+    """
+    Make the points of `owner` match the `periods`: the pending points out of the schedule are deleted,
+    the missing periods are bulk inserted (after `prepare(point)`, as bulk_create skips the signals).
+    Evaluated points and missed ones (pending with a period over) are never touched.
+    Return the (created, deleted) numbers of points.
+    """
+    today = today or date.today()
+    periods = list(dict.fromkeys(periods))
+    expected = set(periods)
+    existing, stale = set(), []
+    for pk, start, end, status in (model.objects
+                                   .filter(**{owner_field: owner})
+                                   .values_list('pk', 'period_start_date', 'period_end_date', 'status')):
+        if (start, end) in expected:
+            existing.add((start, end))
+        elif status in PENDING and end >= today:
+            stale.append(pk)
+
+    deleted = model.objects.filter(pk__in=stale).delete()[1].get(model._meta.label, 0) if stale else 0
+
+    points = [model(**{owner_field: owner}, period_start_date=start, period_end_date=end)
+              for start, end in periods if (start, end) not in existing]
+    if prepare:
+        for point in points:
+            prepare(point)
+    model.objects.bulk_create(points)
+    return len(points), deleted
+
+
+def extend(model, owner_field, schedules, prepare=None, batch_size=1000):
+    """
+    Insert the missing points of many owners at once, `schedules` maps an owner id to its expected periods.
+    Nothing is deleted. The existing points are read in one query. Return the number of points created.
+    """
+    first = min((start for periods in schedules.values() for start, _ in periods), default=None)
+    if first is None:
+        return 0
+    existing = set(model.objects
+                   .filter(**{f'{owner_field}__in': list(schedules)}, period_start_date__gte=first)
+                   .values_list(owner_field, 'period_start_date', 'period_end_date'))
+    points = []
+    for owner_id, periods in schedules.items():
+        for start, end in dict.fromkeys(periods):
+            if (owner_id, start, end) not in existing:
+                points.append(model(**{f'{owner_field}_id': owner_id}, period_start_date=start, period_end_date=end))
+    if prepare:
+        for point in points:
+            prepare(point)
+    model.objects.bulk_create(points, batch_size=batch_size)
+    return len(points)
@@ -1,10 +1,46 @@
-from django.db.models.signals import m2m_changed, pre_save, post_save
+import logging
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Organization, Requirement, Control, ControlPoint, Attachment, Action, Finding, Conformity, \
-    Indicator, IndicatorPoint
+from . import dashboard, previews
+from .models import Organization, Framework, Requirement, Control, ControlPoint, Attachment, Action, Finding, Conformity, \
+    Indicator, IndicatorPoint, Audit
+
+logger = logging.getLogger(__name__)
+
+# Number of post_save cascades run and skipped by depends_on in this process, by handler name
+cascades_run = Counter()
+cascades_skipped = Counter()
+
+
+def cascade_counts():
+    """Return {handler name: {'run': n, 'skipped': n}} of the depends_on handlers called in this process"""
+    return {name: {'run': cascades_run[name], 'skipped': cascades_skipped[name]}
+            for name in sorted(set(cascades_run) | set(cascades_skipped))}
+
+
+def depends_on(*fields):
+    """Run the post_save handler only when one of the `fields` changed (see DirtyFieldsMixin), count the skips"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(**kwargs):
+            if not kwargs['instance'].has_changed(*fields):
+                cascades_skipped[handler.__name__] += 1
+                logger.debug("%s skipped for %r: none of %s changed", handler.__name__, kwargs['instance'],
+                             ", ".join(fields))
+                return None
+            cascades_run[handler.__name__] += 1
+            return handler(**kwargs)
+        return wrapper
+    return decorator
 
 
 @receiver(post_save, sender=Control)
+@depends_on('frequency', 'schedule_anchor')
 def control_post_save_bootstrap(instance: Control, **kwargs):
     Control.controlpoint_bootstrap(instance)
 
@@ -15,6 +51,17 @@ def controlpoint_pre_save_status(sender, instance: ControlPoint, **kwargs):
 @receiver(pre_save, sender=Attachment)
 def attachment_pre_autoset_mimetype(sender, instance: Attachment, **kwargs):
     Attachment.autoset_mimetype(instance)
+    if settings.ATTACHMENT_DEDUPLICATION:
+        Attachment.store_blob(instance)
+
+@receiver(post_save, sender=Attachment)
+def attachment_post_save_preview(sender, instance: Attachment, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: previews.submit(instance.pk))
+
+@receiver(post_delete, sender=Attachment)
+def attachment_post_delete_release_files(sender, instance: Attachment, **kwargs):
+    Attachment.release_files(instance)
 
 @receiver(pre_save, sender=Requirement)
 def requirement_pre_save_naming(instance, **kwargs):
@@ -24,6 +71,52 @@ def requirement_pre_save_naming(instance, **kwargs):
     else:
         instance.name = instance.code
 
+@receiver(pre_save, sender=Requirement)
+def requirement_pre_save_tree(instance, **kwargs):
+    """Remember the MPTT coordinates of an existing Requirement, to know whether the save moves it"""
+    instance._saved_tree = (None if instance._state.adding else
+                            Requirement.objects.filter(pk=instance.pk).values_list('tree_id', 'lft', 'rght', 'level')
+                            .first())
+
+@receiver(post_save, sender=Requirement)
+def requirement_post_save_sync_tree(instance, created, **kwargs):
+    """
+    MPTT shift the coordinates of the tree on insertion or move, copy them on the Conformity of that tree.
+    A new root or a move to another tree renumbers the other trees, all of them are checked.
+    """
+    saved = getattr(instance, '_saved_tree', None)
+    current = (instance.tree_id, instance.lft, instance.rght, instance.level)
+    if saved == current:
+        return
+    if (created and not instance.parent_id) or (saved and saved[0] != instance.tree_id):
+        Conformity.objects.sync_tree()
+    else:
+        Conformity.objects.filter(tree_id=instance.tree_id).sync_tree()
+
+@receiver(post_delete, sender=Requirement)
+def requirement_post_delete_sync_tree(instance, **kwargs):
+    """MPTT close the gap in the tree on deletion, and renumber the next trees when a root is deleted"""
+    if instance.parent_id:
+        Conformity.objects.filter(tree_id=instance.tree_id).sync_tree()
+    else:
+        Conformity.objects.sync_tree()
+
+@receiver(pre_save, sender=Conformity)
+def conformity_pre_save_tree(instance: Conformity, **kwargs):
+    """Set the MPTT coordinates of a new Conformity, or of one whose Requirement was just assigned"""
+    if instance.requirement_id and (instance._state.adding or Conformity.requirement.is_cached(instance)):
+        instance.set_tree(instance.requirement)
+
+@receiver(post_save, sender=Conformity)
+@receiver(post_delete, sender=Conformity)
+def conformity_post_save_clear_matrix(instance: Conformity, **kwargs):
+    """Any change of a Conformity invalidates the comparison matrix of its Framework"""
+    if Conformity.requirement.is_cached(instance) and instance.requirement:
+        Framework.clear_matrix(instance.requirement.framework_id)
+    elif instance.requirement_id:
+        for framework_id in Requirement.objects.filter(pk=instance.requirement_id).values_list('framework', flat=True):
+            Framework.clear_matrix(framework_id)
+
 @receiver(m2m_changed, sender=Organization.applicable_frameworks.through)
 def change_framework(instance, action, pk_set, **kwargs):
     if action == "post_add":
@@ -35,13 +128,13 @@ def change_framework(instance, action, pk_set, **kwargs):
             instance.remove_conformity(pk)
 
 @receiver(post_save, sender=Action)
+@depends_on('status', 'active')
 def action_post_save_sync_findings(instance: Action, **kwargs):
     """
     When an Action is saved (status/active may have changed),
     re-evaluate the archive state of all linked Findings.
     """
-    for f in instance.associated_findings.all():
-        f.update_archived()
+    Finding.objects.refresh_archived(instance.associated_findings.values('pk'))
 
 @receiver(m2m_changed, sender=Action.associated_findings.through)
 def action_finding_sync_on_m2m(instance, action, reverse, pk_set, **kwargs):
@@ -51,18 +144,25 @@ def action_finding_sync_on_m2m(instance, action, reverse, pk_set, **kwargs):
     - reverse=False: `instance` is an Action; `pk_set` are Finding IDs added/removed.
     - reverse=True:  `instance` is a Finding; re-evaluate that single Finding.
     """
+    if action == 'pre_clear' and not reverse:
+        # The links are gone after the clear, remember the Findings to re-evaluate
+        instance._cleared_findings = list(instance.associated_findings.values_list('pk', flat=True))
+        return
     if action not in {'post_add', 'post_remove', 'post_clear'}:
         return
 
     if reverse:
-        findings = [instance]
+        ids = [instance.pk]
+    elif action == 'post_clear':
+        ids = getattr(instance, '_cleared_findings', [])
     else:
-        findings = Finding.objects.filter(pk__in=pk_set) if pk_set else instance.associated_findings.all()
+        ids = list(pk_set)
 
-    for f in findings:
-        f.update_archived()
+    if ids:
+        Finding.objects.refresh_archived(ids)
 
 @receiver(post_save, sender=ControlPoint)
+@depends_on('status', 'period_start_date', 'period_end_date', 'control')
 def controlpoint_post_save_sync(instance: ControlPoint, **kwargs):
     """
     Transactional rule:
@@ -70,29 +170,59 @@ def controlpoint_post_save_sync(instance: ControlPoint, **kwargs):
       - COMPLIANT    (current period) -> try conformity = 100 (CTRL) if no negatives remain
     """
     if instance.is_current_period() and instance.is_final_status():
-        for conf in instance.control.conformity.all():
+        for conf in instance.control.conformity.with_negative_evidence():
             if instance.status == ControlPoint.Status.NONCOMPLIANT:
                 conf.set_status_from(0, Conformity.StatusJustification.CONTROL)
             elif instance.status == ControlPoint.Status.COMPLIANT:
                 conf.set_status_from(100, Conformity.StatusJustification.CONTROL)
 
 @receiver(post_save, sender=Action)
+@depends_on('status')
 def action_post_save_sync(instance: Action, **kwargs):
     """
     Transactional rule:
       - in progress -> conformity = 0 (ACT)
       - ended       -> try conformity = 100 (ACT) if no negatives remain
     """
-    for conf in instance.associated_conformity.all():
+    for conf in instance.associated_conformity.with_negative_evidence():
         if instance.is_in_progress():
             conf.set_status_from(0, Conformity.StatusJustification.ACTION)
         elif instance.is_completed():
             conf.set_status_from(100, Conformity.StatusJustification.ACTION)
 
 @receiver(post_save, sender=Indicator)
+@depends_on('frequency', 'schedule_anchor')
 def indicator_post_save_bootstrap(instance: Indicator, **kwargs):
     instance.indicator_point_init()
 
 @receiver(pre_save, sender=IndicatorPoint)
 def indicatorpoint_pre_save_ctrl(instance: IndicatorPoint, **kwargs):
-    instance.status_update()
\ No newline at end of file
+    instance.status_update()
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+@receiver(post_save, sender=Framework)
+@receiver(post_delete, sender=Framework)
+@receiver(post_save, sender=Audit)
+@receiver(post_delete, sender=Audit)
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=ControlPoint)
+@receiver(post_delete, sender=ControlPoint)
+def dashboard_post_save_clear_shared(**kwargs):
+    """Drop the cached counters and lists of the home dashboard"""
+    dashboard.clear_shared()
+
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+def action_post_save_clear_dashboard(instance: Action, **kwargs):
+    """Drop the dashboard of the owner, and of the previous owner when it changed"""
+    previous = getattr(instance, '_loaded_values', {}).get('owner_id')
+    dashboard.clear_users(instance.owner_id, previous)
+
+@receiver(post_save, sender=Conformity)
+@receiver(post_delete, sender=Conformity)
+def conformity_post_save_clear_dashboard(instance: Conformity, **kwargs):
+    """Drop the dashboard of the responsible, and of the previous responsible when it changed"""
+    previous = getattr(instance, '_loaded_values', {}).get('responsible_id')
+    dashboard.clear_users(instance.responsible_id, previous)
@@ -47,3 +47,35 @@ if (document.getElementById('id_start_date')){
     document.getElementById('id_end_date').type = 'Date'
     document.getElementById('id_report_date').type = 'Date'
 }
+
+if (document.getElementById('history-chart')){
+    // Draw the one-year conformity trend of the organization as step lines (status 0-100 %)
+    const chart = document.getElementById('history-chart');
+    const colors = ['#0d6efd', '#198754', '#dc3545', '#fd7e14', '#6f42c1', '#20c997'];
+    fetch(chart.dataset.url).then(response => response.json()).then(data => {
+        const start = Date.parse(data.start);
+        const span = Math.max(Date.parse(data.end) - start, 1);
+        const x = day => (Date.parse(day) - start) / span * 1000;
+        const y = status => 200 - (status ?? 0) * 2;
+        data.series.forEach((serie, i) => {
+            let path = '';
+            serie.points.forEach(([day, status], j) => {
+                path += (j ? ' H' + x(day) + ' V' : 'M' + x(day) + ' ') + y(status);
+            });
+            path += ' H1000';
+            const line = document.createElementNS('http://www.w3.org/2000/svg', 'path');
+            line.setAttribute('d', path);
+            line.setAttribute('fill', 'none');
+            line.setAttribute('stroke', colors[i % colors.length]);
+            line.setAttribute('stroke-width', '2');
+            line.setAttribute('vector-effect', 'non-scaling-stroke');
+            chart.appendChild(line);
+
+            const label = document.createElement('span');
+            label.className = 'badge me-2';
+            label.style.backgroundColor = colors[i % colors.length];
+            label.textContent = serie.label;
+            document.getElementById('history-legend').appendChild(label);
+        });
+    });
+}
@@ -0,0 +1,65 @@
+"""
+Statistics of the Control and ControlPoint: the number of each level, frequency and status, computed by a single
+conditional aggregate query per model (one Count(filter=...) per bucket).
+They can be grouped by organization, to get the statistics of any subset of organizations from the same rows,
+without another query (see subset).
+"""
+from collections import Counter
+
+from django.db.models import Count, Q
+
+from .models import Control, ControlPoint, PeriodicPointQuerySet
+
+
+def control_buckets():
+    """Conditions of the Control buckets, None counts every row"""
+    buckets = {'total': None}
+    buckets.update({f'level_{level}': Q(level=level) for level in Control.Level.values})
+    buckets.update({f'frequency_{frequency}': Q(frequency=frequency) for frequency in Control.Frequency.values})
+    return buckets
+
+
+def controlpoint_buckets(today=None):
+    """Conditions of the ControlPoint buckets, on their effective status at `today`"""
+    buckets = {'total': None}
+    buckets.update({f'status_{status.lower()}': PeriodicPointQuerySet.effective_q(status, today=today)
+                    for status in ControlPoint.Status.values})
+    to_evaluate = PeriodicPointQuerySet.effective_q('TOBE', today=today)
+    buckets.update({f'to_evaluate_{frequency}': Q(control__frequency=frequency) & to_evaluate
+                    for frequency in Control.Frequency.values})
+    return buckets
+
+
+def aggregate(queryset, buckets, by=None):
+    """
+    Count the rows of the queryset in each bucket. Return a dict of the counts, or with `by`, a dict of the counts
+    of each value of the `by` field.
+    """
+    counts = {name: Count('pk', filter=condition) for name, condition in buckets.items()}
+    if by is None:
+        return queryset.aggregate(**counts)
+    return {row.pop(by): row for row in queryset.order_by().values(by).annotate(**counts)}
+
+
+def controls(queryset=None, by_organization=False):
+    """Statistics of the Control of the queryset, all of them by default"""
+    queryset = Control.objects.all() if queryset is None else queryset
+    return aggregate(queryset, control_buckets(), by='organization' if by_organization else None)
+
+
+def controlpoints(queryset=None, by_organization=False, today=None):
+    """Statistics of the ControlPoint of the queryset, all of them by default"""
+    queryset = ControlPoint.objects.all() if queryset is None else queryset
+    return aggregate(queryset, controlpoint_buckets(today), by='control__organization' if by_organization else None)
+
+
+def subset(breakdown, organizations=None):
+    """
+    Sum the statistics of a breakdown by organization over the `organizations` ids, over all of them when None.
+    A missing bucket counts 0.
+    """
+    total = Counter()
+    for organization, counts in breakdown.items():
+        if organizations is None or organization in organizations:
+            total.update(counts)
+    return total
@@ -0,0 +1,13 @@
+import tempfile
+
+from django.test import override_settings
+
+
+class TemporaryMediaMixin:
+    """Store the uploaded files of the test, and their blobs and previews, in a temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
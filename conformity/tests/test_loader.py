@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from conformity.loader import load_requirements, read_rows
+from conformity.models import Framework, Requirement
+
+CSV = """code,parent,order,title,description
+A,,1,Chapter A,
+B,,2,Chapter B,
+1,A,2,Second,
+2,A,1,First,
+x,A-2,1,Deep,
+1,B,1,Only,
+"""
+
+
+class LoaderTest(TestCase):
+    def setUp(self):
+        self.fw = Framework.objects.create(name="Loaded")
+
+    def test_load_tree(self):
+        stats = load_requirements(self.fw, read_rows(CSV))
+        self.assertEqual(stats['created'], 6)
+        self.assertEqual(stats['trees'], 2)
+        self.assertEqual(set(stats['timings']), {'prepare', 'insert', 'rebuild'})
+
+        deep = Requirement.objects.get(name="A-2-x")
+        self.assertEqual(deep.parent.name, "A-2")
+        self.assertEqual(deep.level, 2)
+        self.assertEqual([r.name for r in Requirement.objects.get(name="A").get_children()], ["A-2", "A-1"])
+        self.assertEqual([r.name for r in Requirement.objects.get(name="A").get_descendants()],
+                         ["A-2", "A-2-x", "A-1"])
+        self.assertEqual(list(self.fw.get_root_requirement().values_list('name', flat=True)), ["A", "B"])
+
+    def test_load_constant_queries(self):
+        def rows(root, size):
+            return [{'code': root, 'parent': None, 'order': 1}] + \
+                [{'code': f"{i}", 'parent': root, 'order': i} for i in range(size)]
+
+        with CaptureQueriesContext(connection) as small:
+            load_requirements(self.fw, rows("S", 5))
+        with CaptureQueriesContext(connection) as large:
+            load_requirements(self.fw, rows("L", 50))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Requirement.objects.get(name="L").get_descendant_count(), 50)
+
+    def test_load_under_existing(self):
+        load_requirements(self.fw, read_rows(CSV))
+        load_requirements(self.fw, [{'code': 'y', 'parent': 'B-1', 'order': 1}])
+        node = Requirement.objects.get(name="B-1-y")
+        self.assertEqual(node.level, 2)
+        self.assertTrue(node.is_descendant_of(Requirement.objects.get(name="B")))
+
+    def test_load_errors(self):
+        Requirement.objects.create(framework=self.fw, code="A", name="A")
+        with self.assertRaises(ValidationError) as cm:
+            load_requirements(self.fw, [
+                {'code': 'A', 'parent': None, 'order': 1},
+                {'code': '1', 'parent': 'Z', 'order': 1},
+                {'code': None, 'parent': None, 'order': 1},
+            ])
+        self.assertEqual(len(cm.exception.messages), 3)
+        self.assertEqual(Requirement.objects.count(), 1)
+
+    def test_load_rejects_too_long_values(self):
+        with self.assertRaises(ValidationError) as cm:
+            load_requirements(self.fw, [
+                {'code': 'TOOLONG', 'parent': None, 'order': 1},
+                {'code': 'R', 'parent': None, 'order': 1, 'title': 'T' * 300},
+                {'code': 'OK', 'parent': None, 'order': 1},
+            ])
+        self.assertEqual(len(cm.exception.messages), 2)
+        self.assertIn("line 1: code TOOLONG longer than 5 characters", cm.exception.messages)
+        self.assertFalse(Requirement.objects.exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(CSV)
+        try:
+            call_command('load_framework', 'Command', f.name, stdout=open(os.devnull, 'w'))
+            self.assertEqual(Requirement.objects.filter(framework__name='Command').count(), 6)
+            with self.assertRaises(CommandError):
+                call_command('load_framework', 'Command', f.name, stdout=open(os.devnull, 'w'))
+        finally:
+            os.unlink(f.name)
+
+    def test_admin_action(self):
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(admin)
+        url = reverse('admin:conformity_framework_changelist')
+        data = {'action': 'load_requirements', '_selected_action': [self.fw.pk]}
+        resp = self.client.post(url, data)
+        self.assertContains(resp, 'name="apply"')
+        resp = self.client.post(url, {**data, 'apply': '1', 'format': 'csv',
+                                      'file': SimpleUploadedFile('fw.csv', CSV.encode())}, follow=True)
+        self.assertContains(resp, "6 requirements loaded")
+        self.assertEqual(Requirement.objects.filter(framework=self.fw).count(), 6)
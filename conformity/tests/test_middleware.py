@@ -1,10 +1,20 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
 from dateutil.relativedelta import relativedelta
-from django.test import TestCase
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 
-from conformity.models import User, Control, ControlPoint
+from conformity import sanity
+from conformity.models import User, Control, ControlPoint, JobLease
 from conformity.middleware import SanityCheckMiddleware
 
+
+def effective(point, today):
+    return ControlPoint.objects.with_effective_status(today).get(pk=point.pk).effective_status
+
 class SanityCheckMiddlewareTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -98,50 +108,138 @@ class SanityCheckMiddlewareTest(TestCase):
         )
 
     def test_missed_controls_update(self):
-        """Test that missed controls are updated to 'MISS'."""
+        """Test that missed controls are 'MISS'."""
         today = datetime.today().date()
-        SanityCheckMiddleware.check_control_points(today)
-
-        self.missed_control_1.refresh_from_db()
-        self.not_missed_control_2.refresh_from_db()
-        self.missed_control_3.refresh_from_db()
 
-        self.assertEqual(self.missed_control_1.status, 'MISS')
-        self.assertEqual(self.not_missed_control_2.status, 'TOBE')
-        self.assertEqual(self.missed_control_3.status, 'MISS')
+        self.assertEqual(effective(self.missed_control_1, today), 'MISS')
+        self.assertEqual(effective(self.not_missed_control_2, today), 'TOBE')
+        self.assertEqual(effective(self.missed_control_3, today), 'MISS')
 
     def test_scheduled_controls_update(self):
-        """Test that scheduled controls are updated to 'TOBE'."""
+        """Test that scheduled controls are 'TOBE'."""
         today = datetime.today().date()
-        SanityCheckMiddleware.check_control_points(today)
 
-        self.scheduled_control_1.refresh_from_db()
-        self.scheduled_control_2.refresh_from_db()
-        self.scheduled_control_3.refresh_from_db()
-
-        self.assertEqual(self.scheduled_control_1.status, 'TOBE')
-        self.assertEqual(self.scheduled_control_2.status, 'TOBE')
-        self.assertEqual(self.scheduled_control_3.status, 'SCHD')
+        self.assertEqual(effective(self.scheduled_control_1, today), 'TOBE')
+        self.assertEqual(effective(self.scheduled_control_2, today), 'TOBE')
+        self.assertEqual(effective(self.scheduled_control_3, today), 'SCHD')
 
     def test_no_update(self):
         """Test some control that should not be updated"""
         today = datetime.today().date()
-        SanityCheckMiddleware.check_control_points(today)
 
         """Test a SCHD control that should not switch to TOBE"""
-        self.scheduled_control_3.refresh_from_db()
-        self.assertEqual(self.scheduled_control_3.status, 'SCHD')
+        self.assertEqual(effective(self.scheduled_control_3, today), 'SCHD')
 
         """Test that controls not in 'TOBE' or 'SCHD' are not updated."""
-        self.not_missed_control.refresh_from_db()
-        self.not_scheduled_control.refresh_from_db()
-
-        self.assertEqual(self.not_missed_control.status, 'MISS')
-        self.assertEqual(self.not_scheduled_control.status, 'TOBE')
+        self.assertEqual(effective(self.not_missed_control, today), 'MISS')
+        self.assertEqual(effective(self.not_scheduled_control, today), 'TOBE')
 
         """Test that controls not in 'OK' or 'NOK' are not updated."""
-        self.ok_control.refresh_from_db()
-        self.nok_control.refresh_from_db()
+        self.assertEqual(effective(self.ok_control, today), 'OK')
+        self.assertEqual(effective(self.nok_control, today), 'NOK')
+
+    def test_effective_filter_matches_annotation(self):
+        """The index friendly filter selects the same points as the annotation"""
+        today = datetime.today().date()
+        annotated = ControlPoint.objects.with_effective_status(today)
+        for status in ('SCHD', 'TOBE', 'MISS', 'OK', 'NOK'):
+            self.assertEqual(set(ControlPoint.objects.effective(status, today=today).values_list('pk', flat=True)),
+                             set(annotated.filter(effective_status=status).values_list('pk', flat=True)), status)
+            for point in ControlPoint.objects.effective(status, today=today):
+                self.assertEqual(point.get_effective_status(today), status)
+
+    def test_stored_status_only_holds_results(self):
+        self.assertEqual(set(ControlPoint.objects.values_list('status', flat=True)), {'SCHD', 'OK', 'NOK'})
+
+
+class SanityCheckSchedulingTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.control = Control.objects.create(title="Scheduled Control")
+        today = datetime.today().date()
+        self.point = ControlPoint.objects.create(
+            control=self.control,
+            period_start_date=today - relativedelta(days=10),
+            period_end_date=today - relativedelta(days=1),
+            status="TOBE"
+        )
 
-        self.assertEqual(self.ok_control.status, 'OK')
-        self.assertEqual(self.nok_control.status, 'NOK')
\ No newline at end of file
+    def test_middleware_only_enqueues(self):
+        middleware = SanityCheckMiddleware(lambda request: HttpResponse())
+        with mock.patch.object(sanity, '_thread', mock.Mock()), \
+                mock.patch.object(sanity, '_last_run', None), \
+                mock.patch.object(sanity, '_wakeup') as wakeup, \
+                self.assertNumQueries(0):
+            middleware(self.factory.get('/'))
+        wakeup.set.assert_called_once()
+
+    def test_enqueue_without_thread(self):
+        with mock.patch.object(sanity, '_thread', None), mock.patch.object(sanity, '_wakeup') as wakeup:
+            sanity.enqueue()
+        wakeup.set.assert_not_called()
+
+    def test_login_only_enqueues(self):
+        User.objects.create_user(username='login', password='password')
+        with mock.patch.object(sanity, 'run_daily_checks') as run, mock.patch.object(sanity, 'enqueue') as enqueue:
+            self.client.login(username='login', password='password')
+        enqueue.assert_called_once()
+        run.assert_not_called()
+
+    @override_settings(SANITY_CHECK_THREAD=False)
+    def test_thread_disabled(self):
+        with mock.patch.object(sanity, '_thread', None):
+            self.assertIsNone(sanity.start())
+
+    def test_command(self):
+        self.point.delete()
+        with mock.patch.object(sanity, '_last_run', None):
+            call_command('run_daily_checks', stdout=StringIO())
+        self.assertEqual(ControlPoint.objects.filter(control=self.control).count(), sanity.SCHEDULE_AHEAD + 1)
+
+
+@mock.patch.object(sanity, '_last_run', None)
+class DailyChecksLeaseTest(TestCase):
+    def setUp(self):
+        self.today = datetime.today().date()
+
+    def test_runs_once_per_day(self):
+        self.assertEqual(sanity.run_daily_checks(self.today), self.today)
+        lease = JobLease.objects.get(name=sanity.JOB_NAME)
+        self.assertEqual(lease.last_run, self.today)
+        self.assertIsNone(lease.lease_until)
+
+        # Another process: a single read, then nothing more for the day
+        sanity._last_run = None
+        with self.assertNumQueries(1):
+            self.assertIsNone(sanity.run_daily_checks(self.today))
+        with self.assertNumQueries(0):
+            self.assertIsNone(sanity.run_daily_checks(self.today))
+
+    def test_skip_while_leased(self):
+        self.assertTrue(JobLease.acquire(sanity.JOB_NAME, self.today))
+        self.assertFalse(JobLease.acquire(sanity.JOB_NAME, self.today))
+        with mock.patch.object(sanity, 'check_schedules') as check_points:
+            self.assertIsNone(sanity.run_daily_checks(self.today))
+        check_points.assert_not_called()
+
+    def test_expired_lease_taken_over(self):
+        JobLease.acquire(sanity.JOB_NAME, self.today, duration=timedelta(seconds=-1))
+        self.assertEqual(sanity.run_daily_checks(self.today), self.today)
+
+    def test_failure_releases_lease(self):
+        with mock.patch.object(sanity, 'check_schedules', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            sanity.run_daily_checks(self.today)
+        lease = JobLease.objects.get(name=sanity.JOB_NAME)
+        self.assertIsNone(lease.last_run)
+        self.assertIsNone(lease.lease_until)
+        self.assertEqual(sanity.run_daily_checks(self.today), self.today)
+
+    def test_next_day(self):
+        sanity.run_daily_checks(self.today - timedelta(days=1))
+        self.assertEqual(sanity.run_daily_checks(self.today), self.today)
+
+    def test_force(self):
+        sanity.run_daily_checks(self.today)
+        with mock.patch.object(sanity, 'check_schedules') as check_points:
+            self.assertEqual(sanity.run_daily_checks(self.today, force=True), self.today)
+        check_points.assert_called_once_with(self.today)
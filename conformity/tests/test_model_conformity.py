@@ -1,13 +1,16 @@
 from datetime import date, timedelta
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.urls import NoReverseMatch
 from django.utils import timezone
 
+from conformity import propagation
 from conformity.models import (
     Framework, Organization, Requirement, Conformity,
-    Action, Control, ControlPoint
+    Action, Control, ControlPoint, FrameworkScore, ConformityHistory, ConformityQuerySet
 )
 
 def _uniq(s: str) -> str:
@@ -110,6 +113,59 @@ class ConformityModelFullTests(TestCase):
         desc = list(self.c_root.get_descendants())
         self.assertCountEqual(desc, [self.c1, self.c2])
 
+    def test_get_leaf_and_completeness(self):
+        self.assertCountEqual(list(self.c_root.get_leaf()), [self.c1, self.c2])
+        self.assertEqual(list(self.c1.get_leaf()), [])
+
+        Conformity.objects.filter(pk=self.c1.pk).update(status=None)
+        Conformity.objects.filter(pk=self.c2.pk).update(status=0)
+        root = Conformity.objects.get(pk=self.c_root.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(root.get_completeness(), 50)
+        self.assertEqual(Conformity.objects.get(pk=self.c1.pk).get_completeness(), 0)
+
+        annotated = Conformity.objects.with_completeness().get(pk=self.c_root.pk)
+        self.assertEqual((annotated.leaf_number, annotated.leaf_evaluated), (2, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.get_completeness(), 50)
+
+    def test_tree_coordinates_follow_requirement_tree(self):
+        # Inserting a requirement shifts the MPTT coordinates of the whole tree
+        r_first = Requirement.objects.create(framework=self.fw, code=_uniq("R-C0"), order=0, parent=self.r_root)
+        c_first = Conformity.objects.create(organization=self.org, requirement=r_first)
+
+        for c in (self.c_root, self.c1, self.c2, c_first):
+            c.refresh_from_db()
+            r = c.requirement
+            r.refresh_from_db()
+            self.assertEqual((c.tree_id, c.lft, c.rght, c.level), (r.tree_id, r.lft, r.rght, r.level))
+
+        self.assertEqual(list(self.c_root.get_children()), [c_first, self.c1, self.c2])
+        self.assertEqual(c_first.get_parent(), self.c_root)
+
+        # Coordinates altered behind the back of the signals are restored by a rebuild
+        Conformity.objects.filter(pk=self.c1.pk).update(lft=None)
+        Requirement.objects.partial_rebuild(self.r_root.tree_id)
+        self.c1.refresh_from_db()
+        self.assertIsNotNone(self.c1.lft)
+        self.assertEqual(Conformity.objects.sync_tree(), 0)
+
+    def test_tree_sync_limited_to_moves(self):
+        fw2 = Framework.objects.create(name=_uniq("FW2"))
+        r_other = Requirement.objects.create(framework=fw2, code=_uniq("R-O"))
+        c_other = Conformity.objects.create(organization=self.org, requirement=r_other)
+        # Altered behind the back of the signals, to see which trees are synchronized
+        Conformity.objects.filter(pk=c_other.pk).update(lft=None)
+
+        with mock.patch.object(ConformityQuerySet, 'sync_tree') as sync_tree:
+            self.r_child1.title = "Renamed"
+            self.r_child1.save()
+        sync_tree.assert_not_called()
+
+        Requirement.objects.create(framework=self.fw, code=_uniq("R-C3"), order=3, parent=self.r_root)
+        c_other.refresh_from_db()
+        self.assertIsNone(c_other.lft)
+
     # ---------- Action / Control getters ----------
 
     def test_get_action_and_get_control(self):
@@ -145,6 +201,30 @@ class ConformityModelFullTests(TestCase):
         items_recent = self.c1.get_related(sort="recent_first")
         self.assertTrue(len(items_recent) >= 1)
 
+    def test_get_related_rows_sorted_and_paginated_by_db(self):
+        extra = Action.objects.create(title="Another", status=Action.Status.ENDED, active=False)
+        extra.associated_conformity.add(self.c1)
+
+        with self.assertNumQueries(1):
+            rows = self.c1.get_related_rows()
+        self.assertEqual([(kind, label) for kind, _, label, _ in rows],
+                         [("action", "Another"), ("action", "Doing"), ("action", "Done"), ("control", "C-Periodic")])
+
+        rows = self.c1.get_related_rows(sort="alpha")
+        self.assertEqual([label for _, _, label, _ in rows], ["Another", "C-Periodic", "Doing", "Done"])
+
+        rows = self.c1.get_related_rows(sort="recent_first")
+        self.assertEqual(rows[-1][0], "control")  # no date: last
+
+        # Only the requested page is hydrated: one UNION query, one query per kind shown
+        with self.assertNumQueries(3):
+            page = self.c1.get_related(sort="alpha", limit=2, offset=1)
+        self.assertEqual(page, [("control", self.ctrl), ("action", self.a_in_progress)])
+
+        rows = self.c1.get_related_rows(negative_only=True)
+        self.assertEqual(rows[0][:2], ("action", self.a_in_progress.pk))
+        self.assertIn(("controlpoint", self.cp_negative.pk, "C-Periodic", self.cp_negative.period_end_date), rows)
+
     def test_get_related_negative_only(self):
         items = self.c1.get_related(negative_only=True, include_actions=True, include_controls=True)
         kinds = [k for (k, _) in items]
@@ -256,3 +336,203 @@ class ConformityModelFullTests(TestCase):
         only_actions = self.c1.get_related(include_actions=True, include_controls=False, only_active=False)
         kinds2 = set(k for (k, _) in only_actions)
         self.assertEqual(kinds2, {"action"})
+
+    def test_recompute_status_single_pass_on_deep_tree(self):
+        # Add a grandchild level below child1 so the tree has three levels
+        r_gc1 = Requirement.objects.create(framework=self.fw, code=_uniq("R-GC1"), order=1, parent=self.r_child1)
+        r_gc2 = Requirement.objects.create(framework=self.fw, code=_uniq("R-GC2"), order=2, parent=self.r_child1)
+        Conformity.objects.create(organization=self.org, requirement=r_gc1, status=40)
+        Conformity.objects.create(organization=self.org, requirement=r_gc2, status=61)
+        Conformity.objects.filter(pk=self.c2.pk).update(status=90)
+
+        # One SELECT for the whole tree, one UPDATE for the changed rows, one upsert of the score
+        with self.assertNumQueries(3):
+            updated = Conformity.recompute_status(self.org, self.fw)
+        self.assertCountEqual([n.pk for n in updated], [self.c1.pk, self.c_root.pk])
+
+        self.c1.refresh_from_db()
+        self.c_root.refresh_from_db()
+        self.assertEqual(self.c1.status, 50)
+        self.assertEqual(self.c_root.status, 70)
+        self.assertEqual(self.c_root.status_justification, Conformity.StatusJustification.CONFORMITY)
+
+        # Nothing changed -> only the score is written back
+        with self.assertNumQueries(2):
+            self.assertEqual(Conformity.recompute_status(self.org, self.fw), [])
+
+    def test_recompute_status_limited_to_ancestors(self):
+        r_gc = Requirement.objects.create(framework=self.fw, code=_uniq("R-GC"), order=1, parent=self.r_child2)
+        Conformity.objects.create(organization=self.org, requirement=r_gc, status=30)
+        Conformity.objects.filter(pk=self.c1.pk).update(status=10, status_justification=Conformity.StatusJustification.EXPERT)
+
+        # Only child1 ancestors are refreshed, child2 stays untouched
+        Conformity.recompute_status(self.org, self.fw, [self.r_child1.id])
+        self.c2.refresh_from_db()
+        self.c_root.refresh_from_db()
+        self.assertIsNone(self.c2.status)
+        self.assertEqual(self.c_root.status, 10)
+
+    # ---------- propagation queue ----------
+
+    def test_set_status_from_propagates_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.c1.set_status_from(20, Conformity.StatusJustification.EXPERT)
+            self.c2.set_status_from(60, Conformity.StatusJustification.EXPERT)
+            # Nothing is propagated before the commit
+            self.c_root.refresh_from_db()
+            self.assertIsNone(self.c_root.status)
+
+        self.c_root.refresh_from_db()
+        self.assertEqual(self.c_root.status, 40)
+        self.assertEqual(self.c_root.status_justification, Conformity.StatusJustification.CONFORMITY)
+
+    def test_propagation_batch_coalesces_nodes(self):
+        with propagation.batch():
+            propagation.mark_dirty(self.c1)
+            propagation.mark_dirty(self.c2)
+            with propagation.batch():
+                propagation.mark_dirty(self.c1)
+
+        Conformity.objects.filter(pk__in=[self.c1.pk, self.c2.pk]).update(status=100)
+        # One query to resolve the frameworks, one to load the tree, one to write the root, one for the score
+        with self.assertNumQueries(4):
+            updated = propagation.flush()
+        self.assertEqual([n.pk for n in updated], [self.c_root.pk])
+        self.assertEqual(propagation.flush(), [])
+
+    def test_propagation_queue_follows_rollbacks(self):
+        node2 = (self.c2.organization_id, self.c2.requirement_id)
+        propagation._local.pending = None
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                propagation.mark_dirty(self.c1)
+                raise IntegrityError
+        # Only held by the callback of the rolled back block, the queue is dropped with it
+        self.assertIsNone(propagation._current_queue(create=False))
+
+        propagation.mark_dirty(self.c2)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                propagation.mark_dirty(self.c1)
+                raise IntegrityError
+        # Still registered outside of the savepoint, the queue keeps its node
+        self.assertIn(node2, propagation._current_queue(create=False).nodes)
+
+    # ---------- materialized framework score ----------
+
+    def test_framework_score_follows_propagation(self):
+        Conformity.objects.filter(pk=self.c1.pk).update(status=40)
+        Conformity.objects.filter(pk=self.c2.pk).update(status=None, applicable=False)
+        Conformity.recompute_status(self.org, self.fw)
+
+        score = FrameworkScore.objects.get(organization=self.org, framework=self.fw)
+        self.assertEqual(score.status, 40)
+        self.assertEqual((score.leaf_number, score.leaf_applicable, score.leaf_evaluated), (2, 1, 1))
+        self.assertEqual(score.completeness, 50)
+        self.assertIsNotNone(score.last_update)
+
+        # Upserted in place, never duplicated
+        self.c2.set_status_from(100, Conformity.StatusJustification.EXPERT)
+        self.c2.update_status()
+        score = FrameworkScore.objects.get(organization=self.org, framework=self.fw)
+        self.assertEqual((score.status, score.completeness), (70, 100))
+
+    def test_rebuild_framework_scores_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        FrameworkScore.objects.create(organization=self.org, framework=self.fw, status=12)
+        out = StringIO()
+        call_command("rebuild_framework_scores", stdout=out)
+        self.assertIn("1 framework scores rebuilt", out.getvalue())
+        score = FrameworkScore.objects.get(organization=self.org, framework=self.fw)
+        self.assertIsNone(score.status)
+        self.assertEqual(score.leaf_number, 2)
+
+    # ---------- daily status history ----------
+
+    def test_history_snapshot_stores_only_changes(self):
+        day = date(2026, 1, 1)
+        Conformity.objects.filter(pk__in=[self.c_root.pk, self.c1.pk]).update(status=40)
+        Conformity.objects.filter(pk=self.c2.pk).update(status=None)
+
+        # c2 was never evaluated: nothing to record for it
+        self.assertEqual(ConformityHistory.snapshot(day), 2)
+        self.assertEqual(ConformityHistory.snapshot(day + timedelta(days=1)), 0)
+
+        Conformity.objects.filter(pk=self.c1.pk).update(status=80)
+        self.assertEqual(ConformityHistory.snapshot(day + timedelta(days=2)), 1)
+
+        # Same day again after a rollback of the value: the day is dropped
+        Conformity.objects.filter(pk=self.c1.pk).update(status=40)
+        self.assertEqual(ConformityHistory.snapshot(day + timedelta(days=2)), 0)
+        self.assertEqual(ConformityHistory.objects.filter(requirement=self.r_child1).count(), 1)
+
+    def test_history_series_starts_with_value_in_force(self):
+        for day, status in ((date(2026, 1, 1), 10), (date(2026, 3, 1), 50), (date(2026, 6, 1), 90)):
+            ConformityHistory.objects.create(organization=self.org, requirement=self.r_child1,
+                                             date=day, status=status)
+
+        with self.assertNumQueries(1):
+            series = ConformityHistory.objects.filter(organization=self.org).series(
+                start=date(2026, 2, 1), end=date(2026, 5, 1))
+        self.assertEqual(series, {(self.org.id, self.r_child1.id): [(date(2026, 2, 1), 10),
+                                                                    (date(2026, 3, 1), 50)]})
+
+    def test_snapshot_conformity_history_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("snapshot_conformity_history", "--date", "2026-01-01", stdout=out)
+        self.assertIn("conformity history rows written", out.getvalue())
+        self.assertTrue(ConformityHistory.objects.filter(date=date(2026, 1, 1)).exists())
+
+    # ---------- evidence annotations ----------
+
+    def test_with_evidence_counts_and_prefetch(self):
+        conformities = list(Conformity.objects.filter(organization=self.org).with_evidence())
+        counts = {c.pk: (c.action_count, c.control_count) for c in conformities}
+        self.assertEqual(counts[self.c1.pk], (1, 1))
+        self.assertEqual(counts[self.c2.pk], (0, 0))
+
+        # With the titles, the lists are prefetched: no per-row query afterwards
+        with self.assertNumQueries(3):
+            conformities = list(Conformity.objects.filter(organization=self.org).with_evidence(titles=True))
+        c1 = next(c for c in conformities if c.pk == self.c1.pk)
+        sorts = ("type_then_title", "recent_first", "alpha")
+        expected = [self.c1.get_related(only_active=True, sort=sort, limit=1, offset=1) for sort in sorts]
+        with self.assertNumQueries(0):
+            self.assertEqual([a.title for a in c1.get_action()], ["Doing"])
+            self.assertEqual([c.title for c in c1.get_control()], ["C-Periodic"])
+            kinds = [kind for kind, _ in c1.get_related(only_active=True)]
+            # Sorted and sliced in memory the same way as by the database
+            pages = [c1.get_related(only_active=True, sort=sort, limit=1, offset=1) for sort in sorts]
+        self.assertEqual(kinds, ["action", "control"])
+        self.assertEqual(pages, expected)
+
+    # ---------- negative evidence ----------
+
+    def test_has_negative_evidence_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.c1.has_negative_evidence())
+        with self.assertNumQueries(1):
+            self.assertFalse(self.c2.has_negative_evidence())
+        self.assertEqual(self.c1.has_negative_evidence(), bool(self.c1.get_related(negative_only=True)))
+
+        # Each kind of evidence is enough on its own
+        self.ctrl.conformity.remove(self.c1)
+        self.assertTrue(self.c1.has_negative_evidence())
+        self.a_in_progress.associated_conformity.remove(self.c1)
+        self.assertFalse(self.c1.has_negative_evidence())
+
+    def test_with_negative_evidence_bulk(self):
+        with self.assertNumQueries(1):
+            evidence = dict(Conformity.objects.filter(organization=self.org)
+                            .with_negative_evidence()
+                            .values_list('pk', 'negative_evidence'))
+        self.assertEqual(evidence, {self.c_root.pk: False, self.c1.pk: True, self.c2.pk: False})
+
+        conformity = Conformity.objects.with_negative_evidence().get(pk=self.c1.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(conformity.has_negative_evidence())
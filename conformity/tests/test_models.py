@@ -1,11 +1,17 @@
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import IntegrityError
-from django.test import TestCase
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import NoReverseMatch
 
 from conformity.models import *
+from conformity.tests import TemporaryMediaMixin
 
+import hashlib
+from calendar import monthrange
 import random
+from unittest.mock import patch
 from statistics import mean
 
 # pylint: disable=no-member
@@ -422,9 +428,9 @@ class ControlPointModelTest(TestCase):
                                     period_end_date=today + timedelta(days=3))
 
     def test_control_point_status(self):
-        miss = ControlPoint.objects.filter(control=self.ctrl, status=ControlPoint.Status.MISSED).count()
-        tobe = ControlPoint.objects.filter(control=self.ctrl, status=ControlPoint.Status.TOBEEVALUATED).count()
-        sche = ControlPoint.objects.filter(control=self.ctrl, status=ControlPoint.Status.SCHEDULED).count()
+        miss = ControlPoint.objects.filter(control=self.ctrl).effective(ControlPoint.Status.MISSED).count()
+        tobe = ControlPoint.objects.filter(control=self.ctrl).effective(ControlPoint.Status.TOBEEVALUATED).count()
+        sche = ControlPoint.objects.filter(control=self.ctrl).effective(ControlPoint.Status.SCHEDULED).count()
 
         self.assertEqual(miss, 1)
         self.assertEqual(tobe, 2)
@@ -522,7 +528,7 @@ class ConformityGetRelatedTests(TestCase):
             self.assertIn("action", kinds)
 
 
-class AttachmentModelLightTests(TestCase):
+class AttachmentModelLightTests(TemporaryMediaMixin, TestCase):
     """
     Very light sanity check for Attachment.
     We avoid strict content-type assertions to remain platform-agnostic.
@@ -537,6 +543,112 @@ class AttachmentModelLightTests(TestCase):
         # And must contain "hello" as the original base name
         self.assertIn("hello", s)
 
+    def test_digest_and_size(self):
+        content = b"%PDF-1.4\n" + b"x" * 100000
+        att = Attachment.objects.create(file=SimpleUploadedFile("big.pdf", content))
+        att.refresh_from_db()
+        self.assertEqual(att.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(att.size, len(content))
+        self.assertEqual(att.mime_type, "application/pdf")
+
+    def test_magic_reads_header_only(self):
+        seen = []
+
+        class Spy:
+            def from_buffer(self, buffer):
+                seen.append(len(buffer))
+                return "text/plain"
+
+        with patch.object(Attachment, 'get_magic', return_value=Spy()):
+            Attachment.objects.create(file=SimpleUploadedFile("big.txt", b"a" * 1000000))
+        self.assertEqual(seen, [Attachment.MIME_HEADER_SIZE])
+
+    def test_magic_instance_reused(self):
+        self.assertIs(Attachment.get_magic(), Attachment.get_magic())
+
+    def test_unchanged_file_not_read_again(self):
+        att = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"hello"))
+        att = Attachment.objects.get(pk=att.pk)
+        with patch.object(Attachment, 'get_magic') as get_magic:
+            att.comment = "updated"
+            att.save()
+        get_magic.assert_not_called()
+
+
+class AttachmentDeduplicationTests(TemporaryMediaMixin, TestCase):
+    """Content addressed storage: identical uploads share one stored file"""
+    def test_identical_uploads_share_blob(self):
+        first = Attachment.objects.create(file=SimpleUploadedFile("policy.pdf", b"same content"))
+        with patch.object(first.file.storage.__class__, 'save') as save:
+            second = Attachment.objects.create(file=SimpleUploadedFile("copy.pdf", b"same content"))
+        save.assert_not_called()
+
+        self.assertEqual(first.file.name, Attachment.blob_name(first.sha256))
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual((str(first), str(second)), ("policy.pdf", "copy.pdf"))
+        self.assertEqual(second.references(), 2)
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b"same content")
+
+    def test_blob_released_with_last_reference(self):
+        first = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"shared"))
+        second = Attachment.objects.create(file=SimpleUploadedFile("b.txt", b"shared"))
+        storage, name = first.file.storage, first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_missing_blob_saved_again(self):
+        first = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"shared"))
+        storage, name = first.file.storage, first.file.name
+        storage.delete(name)
+
+        second = Attachment.objects.create(file=SimpleUploadedFile("b.txt", b"shared"))
+        self.assertEqual(second.file.name, name)
+        with first.file.open('rb') as f:
+            self.assertEqual(f.read(), b"shared")
+
+    def test_upload_during_pending_release(self):
+        first = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"shared"))
+        storage, name = first.file.storage, first.file.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            first.delete()
+
+        # The released file is still there but no longer referenced: the upload does not reuse it
+        second = Attachment.objects.create(file=SimpleUploadedFile("b.txt", b"shared"))
+        self.assertNotEqual(second.file.name, name)
+        for callback in callbacks:
+            callback()
+        self.assertFalse(storage.exists(name))
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), b"shared")
+
+    @override_settings(ATTACHMENT_DEDUPLICATION=False)
+    def test_deduplication_disabled(self):
+        first = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"shared"))
+        second = Attachment.objects.create(file=SimpleUploadedFile("a.txt", b"shared"))
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith("attachments/a"))
+
+        # Both files are removed on deletion, the preview once no attachment shows it
+        storage = first.file.storage
+        preview = first.file.name + ".preview.png"
+        storage.save(preview, ContentFile(b"png"))
+        Attachment.objects.filter(pk__in=[first.pk, second.pk]).update(preview=preview)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(storage.exists(first.file.name))
+        self.assertTrue(storage.exists(preview))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(second.file.name))
+        self.assertFalse(storage.exists(preview))
 
 class FrameworkLanguageChoicesTests(TestCase):
     """Minimal sanity checks for Framework.Language.choices()"""
@@ -708,6 +820,37 @@ class AuditAndFindingExtraTests(TestCase):
         except NoReverseMatch:
             self.skipTest("URLconf for 'conformity:action_index' not available")
 
+class FindingRefreshArchivedTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Org Pentest")
+        self.audit = Audit.objects.create(name="Pentest", auditor="Red team", organization=self.org)
+        self.findings = Finding.objects.bulk_create(
+            [Finding(short_description=f"F{i}", audit=self.audit, severity=Finding.Severity.MAJOR) for i in range(80)])
+        self.action = Action.objects.create(title="Fix all", organization=self.org, status=Action.Status.IMPLEMENTING)
+        self.action.associated_findings.add(*self.findings)
+
+    def test_refresh_archived_is_set_based(self):
+        Action.objects.filter(pk=self.action.pk).update(active=False)
+        with self.assertNumQueries(2):
+            self.assertEqual(Finding.objects.refresh_archived([f.pk for f in self.findings]), 80)
+        self.assertEqual(Finding.objects.filter(archived=True).count(), 80)
+
+        # Idempotent, and an unlinked finding is restored
+        self.assertEqual(Finding.objects.refresh_archived(), 0)
+        self.action.associated_findings.remove(self.findings[0])
+        self.assertFalse(Finding.objects.get(pk=self.findings[0].pk).archived)
+
+    def test_closing_an_action_archives_its_findings_in_constant_queries(self):
+        self.action.status = Action.Status.ENDED
+        with CaptureQueriesContext(connection) as queries:
+            self.action.save()
+        self.assertLess(len(queries.captured_queries), 15)
+        self.assertEqual(Finding.objects.filter(archived=True).count(), 80)
+
+        self.action.associated_findings.clear()
+        self.assertEqual(Finding.objects.filter(archived=True).count(), 0)
+
+
 class ControlAndControlPointExtrasTests(TestCase):
     def setUp(self):
         self.org = Organization.objects.create(name="Org Z")
@@ -736,7 +879,8 @@ class ControlAndControlPointExtrasTests(TestCase):
         cp.period_start_date = date.today()
         cp.period_end_date = date.today()
         ControlPoint.update_status(cp)
-        self.assertEqual(cp.status, ControlPoint.Status.TOBEEVALUATED)
+        self.assertEqual(cp.status, ControlPoint.Status.SCHEDULED)
+        self.assertEqual(cp.get_effective_status(), ControlPoint.Status.TOBEEVALUATED)
         # helper methods
         self.assertTrue(cp.is_current_period(date.today()))
         self.assertTrue(cp.is_final_status() in (False, True))  # just ensure it returns a bool
@@ -747,6 +891,34 @@ class ControlAndControlPointExtrasTests(TestCase):
         acts = list(cp.get_action())
         self.assertEqual(acts, [act])
 
+    def test_schedule_only_follows_frequency_changes(self):
+        ctl = Control.objects.get(pk=self.ctl.pk)
+        before = set(ControlPoint.objects.filter(control=ctl).values_list('id', flat=True))
+
+        # A title edit keeps the schedule untouched: no query on the control points
+        ctl.title = "Renamed"
+        with CaptureQueriesContext(connection) as queries:
+            ctl.save()
+        self.assertFalse([q for q in queries.captured_queries if 'conformity_controlpoint' in q['sql']])
+        self.assertEqual(set(ControlPoint.objects.filter(control=ctl).values_list('id', flat=True)), before)
+
+        # A frequency change diffs the pending points and bulk inserts the missing ones
+        ctl.frequency = Control.Frequency.QUARTERLY
+        ctl.save()
+        self.assertEqual(ControlPoint.objects.filter(control=ctl).count(), 4)
+        self.assertEqual(Control.controlpoint_bootstrap(ctl), (0, 0))
+
+    def test_schedule_keeps_evaluated_points(self):
+        cp = self.ctl.get_controlpoint().first()
+        ControlPoint.objects.filter(pk=cp.pk).update(status=ControlPoint.Status.COMPLIANT)
+        self.ctl.frequency = Control.Frequency.MONTHLY
+        self.ctl.save()
+        self.assertTrue(ControlPoint.objects.filter(pk=cp.pk, status=ControlPoint.Status.COMPLIANT).exists())
+        # Pending points are created with the status the pre_save signal would have set
+        statuses = set(ControlPoint.objects.filter(control=self.ctl).exclude(pk=cp.pk).values_list('status', flat=True))
+        self.assertTrue(statuses <= {ControlPoint.Status.SCHEDULED, ControlPoint.Status.TOBEEVALUATED,
+                                     ControlPoint.Status.MISSED})
+
 class ActionExtrasTests(TestCase):
     def setUp(self):
         self.org = Organization.objects.create(name="Org A")
@@ -0,0 +1,76 @@
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from conformity import previews, views
+from conformity.models import Attachment
+from conformity.tests import TemporaryMediaMixin
+
+
+@override_settings(ATTACHMENT_PREVIEW_WORKERS=0)
+class PreviewTest(TemporaryMediaMixin, TestCase):
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = Attachment.objects.create(file=SimpleUploadedFile(name, content))
+        attachment.refresh_from_db()
+        return attachment
+
+    def test_text_snippet(self):
+        attachment = self.upload("notes.txt", b"Password policy\n" + b"x" * 2000)
+        self.assertIsNotNone(attachment.preview_date)
+        self.assertTrue(attachment.snippet.startswith("Password policy"))
+        self.assertEqual(len(attachment.snippet), previews.SNIPPET_LENGTH)
+        self.assertFalse(attachment.preview)
+
+    def test_generated_once(self):
+        attachment = self.upload("notes.txt", b"hello")
+        with mock.patch.object(previews, 'snippet') as snippet:
+            previews.generate(attachment.pk)
+        snippet.assert_not_called()
+
+    def test_failure_is_logged_and_retried(self):
+        with mock.patch.object(previews, 'snippet', side_effect=OSError), self.assertLogs(previews.logger, 'ERROR'):
+            attachment = self.upload("notes.txt", b"hello")
+        self.assertIsNone(attachment.preview_date)
+        call_command('generate_previews', stdout=mock.MagicMock())
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.snippet, "hello")
+
+    def test_background_worker(self):
+        with override_settings(ATTACHMENT_PREVIEW_WORKERS=1), \
+                mock.patch.object(previews, 'generate', return_value=None) as generate:
+            future = previews.submit(42)
+            future.result(timeout=10)
+        generate.assert_called_once_with(42)
+
+    @skipIf(previews.Image is None, "Pillow is not installed")
+    def test_image_thumbnail(self):
+        from io import BytesIO
+        output = BytesIO()
+        previews.Image.new('RGB', (1200, 800), 'red').save(output, format='PNG')
+        attachment = self.upload("scan.png", output.getvalue())
+        self.assertEqual(attachment.preview.name, previews.preview_name(attachment))
+
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.create_user(username="viewer")
+        resp = views.AttachmentPreviewView.as_view()(request, pk=attachment.pk)
+        self.assertEqual(resp["Content-Type"], "image/png")
+        self.assertIn("immutable", resp["Cache-Control"])
+
+    def test_preview_view_without_preview(self):
+        attachment = self.upload("notes.txt", b"hello")
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.create_user(username="viewer")
+        with self.assertRaises(Http404):
+            views.AttachmentPreviewView.as_view()(request, pk=attachment.pk)
+
+    def test_shared_preview(self):
+        first = self.upload("a.txt", b"same")
+        name = first.file.storage.save(previews.preview_name(first), ContentFile(b"png"))
+        second = self.upload("b.txt", b"same")
+        self.assertEqual(second.preview.name, name)
@@ -0,0 +1,68 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from conformity import schedule
+from conformity.models import Control, ControlPoint, Indicator, IndicatorPoint
+
+
+class PeriodEngineTest(SimpleTestCase):
+    def test_calendar_periods(self):
+        self.assertEqual(schedule.year_periods(1, 2024), [(date(2024, 1, 1), date(2024, 12, 31))])
+        self.assertEqual(schedule.year_periods(4, 2024)[0], (date(2024, 1, 1), date(2024, 3, 31)))
+        self.assertEqual(schedule.year_periods(6, 2024)[0], (date(2024, 1, 1), date(2024, 2, 29)))
+        monthly = schedule.year_periods(12, 2023)
+        self.assertEqual(len(monthly), 12)
+        self.assertEqual(monthly[1], (date(2023, 2, 1), date(2023, 2, 28)))
+        # Contiguous periods, no gap and no overlap
+        for (_, end), (start, _) in zip(monthly, monthly[1:]):
+            self.assertEqual((start - end).days, 1)
+
+    def test_weekly_periods_start_on_monday(self):
+        periods = schedule.year_periods(schedule.WEEKLY, 2025)
+        self.assertEqual(periods[0], (date(2024, 12, 30), date(2025, 1, 5)))
+        self.assertTrue(all(start.weekday() == 0 for start, _ in periods))
+        self.assertEqual(len(periods), 53)
+
+    def test_custom_anchor(self):
+        # Fiscal year starting in April
+        self.assertEqual(schedule.period_at(1, date(2025, 2, 10), date(2020, 4, 1))[1],
+                         (date(2024, 4, 1), date(2025, 3, 31)))
+        # A month end anchor does not drift on short months
+        periods = schedule.periods_ahead(12, date(2025, 1, 31), 3, anchor=date(2025, 1, 31))
+        self.assertEqual([start for start, _ in periods],
+                         [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+        self.assertEqual(periods[0][1], date(2025, 2, 27))
+
+    def test_unsupported_frequency(self):
+        with self.assertRaises(ValueError):
+            schedule.period_at(5, date(2025, 1, 1))
+
+
+class ExtendSchedulesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='scheduler')
+        cls.control = Control.objects.create(title="Monthly", frequency=Control.Frequency.MONTHLY)
+        cls.indicator = Indicator.objects.create(name="KPI", responsible=cls.user,
+                                                 frequency=Indicator.Frequency.QUARTERLY)
+
+    def test_extend_schedules_in_bulk(self):
+        today = date.today()
+        created = Control.extend_schedules(14, today)
+        # The current year is already scheduled: only the following periods are added
+        start, end = schedule.periods_ahead(12, today, 14)[-1]
+        self.assertTrue(ControlPoint.objects.filter(control=self.control, period_start_date=start,
+                                                    period_end_date=end).exists())
+        self.assertGreater(created, 0)
+        self.assertEqual(Control.extend_schedules(14, today), 0)
+
+    def test_extend_schedules_command(self):
+        out = StringIO()
+        call_command("extend_schedules", "--periods", "8", stdout=out)
+        self.assertIn("control points and", out.getvalue())
+        self.assertGreaterEqual(IndicatorPoint.objects.filter(indicator=self.indicator,
+                                                              period_start_date__gt=date.today()).count(), 8)
@@ -4,9 +4,10 @@ from django.utils import timezone
 
 from conformity.models import (
     Framework, Organization, Requirement, Conformity, Control, ControlPoint, Action, Attachment, Audit, Finding)
+from conformity.tests import TemporaryMediaMixin
 
 
-class SignalTests(TestCase):
+class SignalTests(TemporaryMediaMixin, TestCase):
     """Signal-driven lifecycle tests (m2m, update_status/post_save hooks)."""
 
     def test_requirement_presave_sets_hierarchical_name(self):
@@ -98,7 +99,7 @@ class SignalTests(TestCase):
                 period_end_date=frozen_today - datetime.timedelta(days=30),
             )
             manual_past.refresh_from_db()
-            self.assertEqual(manual_past.status, ControlPoint.Status.MISSED)
+            self.assertEqual(manual_past.effective_status, ControlPoint.Status.MISSED)
 
             # Collect IDs of past CPs before frequency change
             before_qs = ControlPoint.objects.filter(control=ctrl)
@@ -139,7 +140,7 @@ class SignalTests(TestCase):
             )
 
     def test_controlpoint_presave_status_transitions(self):
-        """ControlPoint update_status should set status based on the current period window."""
+        """ControlPoint effective_status derives from the current period window."""
         ctrl = Control.objects.create(title="StatusCalc", frequency=Control.Frequency.YEARLY)
         today = date.today()
 
@@ -163,9 +164,9 @@ class SignalTests(TestCase):
         cp_now.refresh_from_db()
         cp_future.refresh_from_db()
 
-        self.assertEqual(cp_past.status, ControlPoint.Status.MISSED)
-        self.assertEqual(cp_now.status, ControlPoint.Status.TOBEEVALUATED)
-        self.assertEqual(cp_future.status, ControlPoint.Status.SCHEDULED)
+        self.assertEqual(cp_past.effective_status, ControlPoint.Status.MISSED)
+        self.assertEqual(cp_now.effective_status, ControlPoint.Status.TOBEEVALUATED)
+        self.assertEqual(cp_future.effective_status, ControlPoint.Status.SCHEDULED)
 
     def test_attachment_presave_sets_mime_type(self):
         """
@@ -244,6 +245,64 @@ class SignalTests(TestCase):
         finding.refresh_from_db()
         self.assertFalse(finding.archived, msg="Finding with no action should not be archived")
 
+    def test_changed_fields_tracking(self):
+        """DirtyFieldsMixin reports the fields changed since the load or the last save."""
+        act = Action.objects.create(title="Tracked", status=Action.Status.PLANNING)
+        self.assertEqual(act.changed_fields, set())
+
+        act = Action.objects.get(pk=act.pk)
+        act.description = "Only a description"
+        self.assertEqual(act.changed_fields, {"description"})
+        self.assertFalse(act.has_changed("status", "active"))
+        act.save()
+        self.assertEqual(act.changed_fields, set())
+
+        self.assertTrue(Action(title="New").has_changed("status"))
+
+    def test_handlers_skip_unrelated_changes(self):
+        """Saving only a description skips the cascades, and the skips are counted."""
+        from conformity import signals
+
+        org = Organization.objects.create(name="Org-Skip")
+        audit = Audit.objects.create(organization=org, auditor="Skip")
+        finding = Finding.objects.create(audit=audit, short_description="F", severity=Finding.Severity.MINOR)
+        act = Action.objects.create(title="Skip", organization=org, status=Action.Status.PLANNING)
+        act.associated_findings.add(finding)
+        ctrl = Control.objects.create(title="Skip", frequency=Control.Frequency.YEARLY)
+
+        before = signals.cascade_counts()
+        act = Action.objects.get(pk=act.pk)
+        act.description = "comment only"
+        with self.assertNumQueries(4):  # auditlog diff (action, organization) and entry + UPDATE only
+            act.save()
+        ctrl = Control.objects.get(pk=ctrl.pk)
+        ctrl.description = "comment only"
+        ctrl.save()
+
+        def delta(name, kind):
+            return signals.cascade_counts()[name][kind] - before.get(name, {}).get(kind, 0)
+
+        self.assertEqual(delta("action_post_save_sync_findings", "skipped"), 1)
+        self.assertEqual(delta("action_post_save_sync", "skipped"), 1)
+        self.assertEqual(delta("control_post_save_bootstrap", "skipped"), 1)
+        self.assertEqual(delta("action_post_save_sync_findings", "run"), 0)
+
+        # A status change still runs them
+        act.status = Action.Status.ENDED
+        act.save()
+        self.assertEqual(delta("action_post_save_sync_findings", "run"), 1)
+        finding.refresh_from_db()
+        self.assertTrue(finding.archived)
+
+    def test_update_fields_snapshot(self):
+        """A save with update_fields only marks the written fields as saved."""
+        act = Action.objects.create(title="Partial", status=Action.Status.PLANNING)
+        act.title = "Written"
+        act.status = Action.Status.ENDED
+        act.save(update_fields=["title"])
+        self.assertIn("status", act.changed_fields)
+        self.assertNotIn("title", act.changed_fields)
+
 def test_controlpoint_final_status_updates_conformity(self):
     """
     ControlPoint final status should propagate to related leaf Conformity through signals.
@@ -1,15 +1,23 @@
+import json
+from collections import Counter
+from datetime import date, timedelta
 from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, RequestFactory
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import FileResponse, Http404
+from django.test import TestCase, RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
-from conformity import views
+from conformity import stats, views
 from conformity.models import (
     Organization, Framework, Requirement, Conformity,
-    Audit, Action, Finding, Control, ControlPoint, Attachment
+    Audit, Action, Finding, Control, ControlPoint, Attachment, FrameworkScore,
+    ConformityHistory
 )
+from conformity.tests import TemporaryMediaMixin
 from conformity.views import ConformityUpdateView
 
 User = get_user_model()
@@ -116,9 +124,151 @@ class LoginRequired(BaseDataMixin, TestCase):
         self.assertIn(response.status_code, (301, 302))
 
 
+class ControlIndexStats(BaseDataMixin, TestCase):
+    FRAMEWORK_NAME = "FW-ControlIndex"
+
+    def setUp(self):
+        super().setUp()
+        self.org_b = Organization.objects.create(name="Org-B")
+        self.ctrl_y = Control.objects.create(
+            title="CtrlY",
+            organization=self.org_b,
+            frequency=Control.Frequency.YEARLY,
+            level=Control.Level.SECOND,
+        )
+
+    def index(self, **params):
+        request = self.factory.get("/control/", params)
+        request.user = self.user
+        resp = views.ControlIndexView.as_view()(request)
+        resp.render()
+        return resp
+
+    def test_one_query_per_model(self):
+        with self.assertNumQueries(1):
+            stats.controls()
+        with self.assertNumQueries(1):
+            stats.controlpoints(by_organization=True)
+
+    def test_controls(self):
+        counts = stats.controls()
+        self.assertEqual(counts["total"], Control.objects.count())
+        self.assertEqual(counts["level_1"], Control.objects.filter(level=1).count())
+        self.assertEqual(counts["level_2"], Control.objects.filter(level=2).count())
+        self.assertEqual(counts["frequency_4"], Control.objects.filter(frequency=4).count())
+
+    def test_controlpoints(self):
+        counts = stats.controlpoints()
+        self.assertEqual(counts["total"], ControlPoint.objects.count())
+        for status in ControlPoint.Status.values:
+            self.assertEqual(counts[f"status_{status.lower()}"], ControlPoint.objects.effective(status).count())
+        self.assertEqual(counts["to_evaluate_1"],
+                         ControlPoint.objects.filter(control__frequency=1).effective("TOBE").count())
+
+    def test_breakdown_by_organization(self):
+        breakdown = stats.controls(by_organization=True)
+        self.assertEqual(breakdown[self.org.pk]["level_1"], 1)
+        self.assertEqual(breakdown[self.org_b.pk]["level_2"], 1)
+        self.assertEqual(stats.subset(breakdown), Counter(stats.controls()))
+        self.assertEqual(stats.subset(breakdown, {self.org_b.pk})["total"], 1)
+        self.assertEqual(stats.subset(breakdown, {0})["total"], 0)
+
+        points = stats.subset(stats.controlpoints(by_organization=True), {self.org_b.pk})
+        self.assertEqual(points["total"], ControlPoint.objects.filter(control__organization=self.org_b).count())
+
+    def test_context(self):
+        context = self.index().context_data
+        self.assertIsNone(context["organization"])
+        self.assertEqual(context["control_stats"]["total"], Control.objects.count())
+        self.assertEqual(context["controlpoint_stats"]["status_tobe"], ControlPoint.objects.effective("TOBE").count())
+
+    def test_weekly_card(self):
+        ctrl_w = Control.objects.create(title="CtrlW", organization=self.org, frequency=Control.Frequency.WEEKLY)
+        resp = self.index()
+        expected = ControlPoint.objects.filter(control=ctrl_w).effective("TOBE").count()
+        self.assertEqual(resp.context_data["controlpoint_stats"]["to_evaluate_52"], expected)
+        self.assertContains(resp, "control__frequency=52")
+
+    def test_context_follows_filters(self):
+        resp = self.index(level=Control.Level.SECOND)
+        context = resp.context_data
+        self.assertEqual(context["control_stats"]["total"], len(context["object_list"]))
+        self.assertEqual((context["control_stats"]["level_1"], context["control_stats"]["level_2"]), (0, 1))
+        self.assertEqual(context["controlpoint_stats"]["total"],
+                         ControlPoint.objects.filter(control__level=Control.Level.SECOND).count())
+
+    def test_context_filtered_by_organization(self):
+        context = self.index(organization=self.org_b.pk).context_data
+        self.assertEqual(context["organization"], self.org_b)
+        self.assertEqual(context["control_stats"]["total"], 1)
+        self.assertEqual(context["control_stats"]["level_1"], 0)
+        self.assertEqual(context["controlpoint_stats"]["to_evaluate_1"],
+                         ControlPoint.objects.filter(control=self.ctrl_y).effective("TOBE").count())
+
+
 class HomeViewContext(BaseDataMixin, TestCase):
     FRAMEWORK_NAME = "FW-HomeView"
 
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def home(self):
+        request = self.factory.get("/home")
+        request.user = self.user
+        resp = views.HomeView.as_view()(request)
+        resp.render()
+        return resp
+
+    def test_counters(self):
+        counters = self.home().context_data["counters"]
+        self.assertEqual(counters["organizations"], Organization.objects.count())
+        self.assertEqual(counters["frameworks"], Framework.objects.count())
+        self.assertEqual(counters["audits"], Audit.objects.count())
+        self.assertEqual(counters["actions"], Action.objects.count())
+        self.assertEqual(counters["active_actions"], Action.objects.filter(active=True).count())
+        self.assertEqual(counters["controls_to_evaluate"], ControlPoint.objects.effective("TOBE").count())
+
+    def test_cached_blocks(self):
+        # Cold: one query per counted model, one per list, no query per row while rendering
+        with self.assertNumQueries(5 + 4 + 2):
+            self.home()
+        with self.assertNumQueries(0):
+            self.home()
+
+    def test_invalidated_by_signals(self):
+        self.home()
+        act = Action.objects.create(title="Act3", owner=self.user, organization=self.org)
+        ctx = self.home().context_data
+        self.assertIn(act, ctx["my_action"])
+        self.assertEqual(ctx["counters"]["actions"], Action.objects.count())
+
+        other = User.objects.create_user(username="other", password="p@ss")
+        self.home()
+        act.owner = other
+        act.save()
+        self.assertNotIn(act, self.home().context_data["my_action"])
+
+    def test_conformity_responsible_invalidated(self):
+        other = User.objects.create_user(username="other", password="p@ss")
+        self.home()
+        conformity = Conformity.objects.get(pk=self.c_a.pk)
+        conformity.responsible = other
+        conformity.save()
+        self.assertNotIn(self.c_a, self.home().context_data["my_conformity"])
+
+        # The bulk updates of the tree send no post_save
+        Conformity.objects.filter(pk=self.c_root.pk).update(responsible=self.user)
+        self.c_root.refresh_from_db()
+        self.home()
+        Conformity.objects.filter(pk=self.c_a.pk).update(status=80)
+        Conformity.recompute_status(self.org, self.fw)
+        root = next(c for c in self.home().context_data["my_conformity"] if c.pk == self.c_root.pk)
+        self.assertEqual(root.status, 80)
+
+        self.c_root.update_responsible()
+        self.assertEqual(set(self.home().context_data["my_conformity"]), {self.c_root, self.c_a, self.c_b})
+
     def test_context_lists_and_filters(self):
         """HomeView context must contain expected lists and proper filters."""
         request = self.factory.get("/home")
@@ -127,15 +277,35 @@ class HomeViewContext(BaseDataMixin, TestCase):
         self.assertEqual(resp.status_code, 200)
 
         ctx = resp.context_data
-        self.assertIn("conformity_list", ctx)
-        # Only root conformity should be in level=0 list
-        self.assertIn(self.c_root, list(ctx["conformity_list"]))
-        self.assertNotIn(self.c_a, list(ctx["conformity_list"]))
         self.assertIn(self.act1, list(ctx["my_action"]))
         self.assertIn(self.c_a, list(ctx["my_conformity"]))
         self.assertIn(self.cp, list(ctx["cp_list"]))
 
 
+class ControlPointIndexViewTests(BaseDataMixin, TestCase):
+    FRAMEWORK_NAME = "FW-ControlPointIndex"
+
+    def test_filter_on_effective_status(self):
+        today = timezone.now().date()
+        missed = ControlPoint.objects.create(control=self.ctrl_q, period_start_date=today - timedelta(days=10),
+                                             period_end_date=today - timedelta(days=1))
+        request = self.factory.get("/controlpoint", {"status": "TOBE"})
+        request.user = self.user
+        resp = views.ControlPointIndexView.as_view()(request)
+        points = list(resp.context_data["object_list"])
+        self.assertIn(self.cp, points)
+        self.assertNotIn(missed, points)
+        self.assertTrue(all(cp.effective_status == "TOBE" for cp in points))
+
+        request = self.factory.get("/controlpoint", {"status": "MISS"})
+        request.user = self.user
+        resp = views.ControlPointIndexView.as_view()(request)
+        points = list(resp.context_data["object_list"])
+        self.assertIn(missed, points)
+        self.assertTrue(all(cp.effective_status == "MISS" for cp in points))
+        resp.render()
+
+
 class FindingIndexView(BaseDataMixin, TestCase):
     FRAMEWORK_NAME = "FW-FindingIndex"
 
@@ -163,6 +333,39 @@ class ConformityIndexViews(BaseDataMixin, TestCase):
         objs = list(resp.context_data["object_list"])
         self.assertEqual(objs, [self.c_root])
 
+    def test_conformity_index_completeness_in_one_query(self):
+        """ConformityIndexView must count the leaves of each root, for all roots at once."""
+        req_root2 = Requirement.objects.create(code="ROOT2", title="Root 2", framework=self.fw, parent=None, order=2)
+        req_c = Requirement.objects.create(code="C", title="C", framework=self.fw, parent=req_root2, order=1)
+        c_root2 = Conformity.objects.create(organization=self.org, requirement=req_root2)
+        Conformity.objects.create(organization=self.org, requirement=req_c, status=100)
+        Conformity.objects.filter(pk=self.c_a.pk).update(status=100)
+        request = self.factory.get("/conformities")
+        request.user = self.user
+        with self.assertNumQueries(1):
+            resp = views.ConformityIndexView.as_view()(request)
+            resp.render()
+        roots = {c.pk: c for c in resp.context_data["object_list"]}
+        self.assertEqual((roots[self.c_root.pk].leaf_number, roots[self.c_root.pk].get_completeness()), (2, 50))
+        self.assertEqual((roots[c_root2.pk].leaf_number, roots[c_root2.pk].get_completeness()), (1, 100))
+
+    def test_organization_index_lists_frameworks_without_score(self):
+        """OrganizationIndexView must list every applicable framework, scored or not, without per-row queries."""
+        fw2 = Framework.objects.create(name="FW-OrgIndex-2", publish_by="ISO", version=1)
+        fw3 = Framework.objects.create(name="FW-OrgIndex-3", publish_by="ISO", version=1)
+        self.org.applicable_frameworks.add(fw2, fw3)
+        FrameworkScore.objects.filter(framework=fw2).delete()
+        request = self.factory.get("/organization")
+        request.user = self.user
+        with self.assertNumQueries(3):
+            resp = views.OrganizationIndexView.as_view()(request)
+            resp.render()
+        org = resp.context_data["object_list"][0]
+        scores = dict(org.get_framework_scores())
+        self.assertIsNotNone(scores[fw3])
+        self.assertIsNone(scores[fw2])
+        self.assertIn("FW-OrgIndex-2", resp.rendered_content)
+
     def test_conformity_detail_index_queryset_scoped(self):
         """ConformityDetailIndexView must filter by org and framework (pol)."""
         request = self.factory.get("/conformities/detail")
@@ -172,6 +375,202 @@ class ConformityIndexViews(BaseDataMixin, TestCase):
         objs = list(resp.context_data["object_list"])
         self.assertEqual(objs, [self.c_root])
 
+    def test_conformity_detail_index_renders_tree_in_constant_queries(self):
+        """ConformityDetailIndexView must render the whole tree without per-row queries."""
+        req_a1 = Requirement.objects.create(code="A1", title="A1", framework=self.fw, parent=self.req_a, order=1)
+        Conformity.objects.create(organization=self.org, requirement=req_a1, status=50)
+        self.act1.associated_conformity.add(self.c_a)
+        self.ctrl_q.conformity.add(self.c_a, self.c_b)
+
+        request = self.factory.get("/conformities/detail")
+        request.user = self.user
+        # One query for the tree, one prefetch for the controls and one for the actions
+        with self.assertNumQueries(3):
+            resp = views.ConformityDetailIndexView.as_view()(request, org=self.org.id, pol=self.fw.id)
+            resp.render()
+
+        self.assertEqual(resp.context_data["leaf_number"], 2)
+        self.assertEqual(resp.context_data["completeness"], 50)
+        root = resp.context_data["object_list"][0]
+        self.assertEqual(list(root.get_children()), [self.c_a, self.c_b])
+        self.assertEqual(root.get_children()[0].action_count, 1)
+        self.assertEqual(root.get_children()[1].control_count, 1)
+        self.assertContains(resp, "ROOT-A-A1")
+        self.assertContains(resp, "Act1")
+
+class OrganizationHistoryViewTests(BaseDataMixin, TestCase):
+    FRAMEWORK_NAME = "FW-OrganizationHistory"
+
+    def test_history_returns_root_series(self):
+        today = timezone.localdate()
+        ConformityHistory.objects.create(organization=self.org, requirement=self.req_root,
+                                         date=today - timedelta(days=400), status=20)
+        ConformityHistory.objects.create(organization=self.org, requirement=self.req_root,
+                                         date=today - timedelta(days=10), status=60)
+        ConformityHistory.objects.create(organization=self.org, requirement=self.req_a,
+                                         date=today - timedelta(days=10), status=100)
+
+        request = self.factory.get("/organization/history")
+        request.user = self.user
+        resp = views.OrganizationHistoryView.as_view()(request, pk=self.org.pk)
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertEqual(len(data["series"]), 1)
+        self.assertEqual(data["series"][0]["requirement"], self.req_root.id)
+        self.assertEqual([status for _, status in data["series"][0]["points"]], [20, 60])
+        self.assertEqual(data["series"][0]["points"][0][0], data["start"])
+
+
+    def test_history_rejects_invalid_parameters(self):
+        for params, status in (({"requirement": "abc"}, 400), ({"days": "x"}, 400), ({"requirement": 0}, 404)):
+            request = self.factory.get("/organization/history", params)
+            request.user = self.user
+            if status == 404:
+                with self.assertRaises(Http404):
+                    views.OrganizationHistoryView.as_view()(request, pk=self.org.pk)
+            else:
+                resp = views.OrganizationHistoryView.as_view()(request, pk=self.org.pk)
+                self.assertEqual(resp.status_code, status)
+
+    def test_history_days_clamped(self):
+        for days, expected in (("-5", 1), ("1000000", views.OrganizationHistoryView.MAX_DAYS)):
+            request = self.factory.get("/organization/history", {"days": days})
+            request.user = self.user
+            data = json.loads(views.OrganizationHistoryView.as_view()(request, pk=self.org.pk).content)
+            self.assertEqual(timezone.localdate() - timedelta(days=expected), date.fromisoformat(data["start"]))
+
+
+class FrameworkMatrixViewTests(BaseDataMixin, TestCase):
+    FRAMEWORK_NAME = "FW-FrameworkMatrix"
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.org_b = Organization.objects.create(name="Org-B")
+        self.org_b.applicable_frameworks.add(self.fw)
+        Conformity.objects.filter(organization=self.org, requirement=self.req_a).update(status=100)
+        Conformity.objects.filter(organization=self.org_b, requirement=self.req_b).update(applicable=False)
+
+    def test_matrix_is_computed_once_then_cached(self):
+        with self.assertNumQueries(1):
+            organizations, requirements, grid = self.fw.get_matrix()
+        self.assertEqual([name for _, name in organizations], ["Org-A", "Org-B"])
+        self.assertEqual([r for r, _, _ in requirements], [self.req_a.id, self.req_b.id])
+        self.assertEqual(grid[(self.org.id, self.req_a.id)], (100, True))
+        self.assertEqual(grid[(self.org_b.id, self.req_b.id)], (None, False))
+
+        with self.assertNumQueries(0):
+            self.fw.get_matrix()
+
+        # Any saved conformity of the framework invalidates the matrix
+        self.c_b.status = 50
+        self.c_b.save()
+        _, _, grid = self.fw.get_matrix()
+        self.assertEqual(grid[(self.org.id, self.req_b.id)], (50, True))
+
+    @override_settings(MATRIX_CACHE_TTL=42)
+    def test_matrix_cache_expires(self):
+        # Other processes never see the invalidation with a local memory cache: the entry must expire
+        with mock.patch("conformity.models.cache.set") as cache_set:
+            self.fw.get_matrix()
+        self.assertEqual(cache_set.call_args.args[2], 42)
+
+    def test_matrix_view_and_csv(self):
+        request = self.factory.get("/framework/matrix")
+        request.user = self.user
+        resp = views.FrameworkMatrixView.as_view()(request, pk=self.fw.pk)
+        resp.render()
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Org-B")
+        self.assertContains(resp, "100 %")
+
+        resp = views.FrameworkMatrixExportView.as_view()(request, pk=self.fw.pk)
+        self.assertEqual(resp["Content-Type"], "text/csv")
+        lines = resp.content.decode().splitlines()
+        self.assertEqual(lines[0], f"Organization,{self.req_a.name},{self.req_b.name}")
+        self.assertEqual(lines[1], "Org-A,100,")
+        self.assertEqual(lines[2], "Org-B,,N/A")
+
+    def test_matrix_csv_filename_escaped(self):
+        Framework.objects.filter(pk=self.fw.pk).update(name='ISO "27001"; Sécurité')
+        request = self.factory.get("/framework/matrix")
+        request.user = self.user
+        resp = views.FrameworkMatrixExportView.as_view()(request, pk=self.fw.pk)
+        self.assertEqual(resp["Content-Disposition"],
+                         "attachment; filename*=utf-8''ISO%20%2227001%22%3B%20S%C3%A9curit%C3%A9-matrix.csv")
+
+
+class AttachmentDownloadViewTests(TemporaryMediaMixin, TestCase):
+    CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username="downloader", password="p@ss")
+        self.attachment = Attachment.objects.create(file=SimpleUploadedFile("évidence.pdf", self.CONTENT))
+
+    def get(self, **headers):
+        request = self.factory.get("/", headers=headers)
+        request.user = self.user
+        return views.AttachmentDownloadView.as_view()(request, pk=self.attachment.pk)
+
+    def test_full_download(self):
+        resp = self.get()
+        self.assertIsInstance(resp, FileResponse)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertEqual(resp["Content-Length"], str(len(self.CONTENT)))
+        self.assertEqual(resp["ETag"], f'"{self.attachment.sha256}"')
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+        self.assertIn("filename*=utf-8''%C3%A9vidence.pdf", resp["Content-Disposition"])
+        self.assertEqual(b"".join(resp.streaming_content), self.CONTENT)
+
+    def test_not_modified(self):
+        resp = self.get(if_none_match=f'"{self.attachment.sha256}"')
+        self.assertEqual(resp.status_code, 304)
+
+    def test_range(self):
+        resp = self.get(range="bytes=10-19")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], f"bytes 10-19/{len(self.CONTENT)}")
+        self.assertEqual(resp["Content-Length"], "10")
+        self.assertEqual(b"".join(resp.streaming_content), self.CONTENT[10:20])
+
+        resp = self.get(range="bytes=-5")
+        self.assertEqual(b"".join(resp.streaming_content), self.CONTENT[-5:])
+        resp = self.get(range="bytes=100-")
+        self.assertEqual(b"".join(resp.streaming_content), self.CONTENT[100:])
+
+    def test_range_not_satisfiable(self):
+        resp = self.get(range=f"bytes={len(self.CONTENT)}-")
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp["Content-Range"], f"bytes */{len(self.CONTENT)}")
+
+    def test_range_ignored(self):
+        self.assertEqual(self.get(range="bytes=0-1,5-6").status_code, 200)
+        # Invalid range specs are ignored, not unsatisfiable
+        self.assertEqual(self.get(range="bytes=5-3").status_code, 200)
+        self.assertEqual(self.get(range="bytes=a-3").status_code, 200)
+        self.assertEqual(self.get(range="bytes=-").status_code, 200)
+        self.assertEqual(self.get(range="bytes=-0").status_code, 416)
+        self.assertEqual(self.get(range="bytes=0-1", if_range='"stale"').status_code, 200)
+
+    @override_settings(ATTACHMENT_ACCEL_REDIRECT="/protected/")
+    def test_accel_redirect(self):
+        resp = self.get()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["X-Accel-Redirect"], "/protected/" + self.attachment.file.name)
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertEqual(resp.content, b"")
+
+    @override_settings(ATTACHMENT_DEDUPLICATION=False, ATTACHMENT_ACCEL_REDIRECT="/protected/")
+    def test_accel_redirect_quoted(self):
+        self.attachment = Attachment.objects.create(file=SimpleUploadedFile("évidence-finale.pdf", self.CONTENT))
+        self.assertEqual(self.attachment.file.name, "attachments/évidence-finale.pdf")
+        resp = self.get()
+        self.assertEqual(resp["X-Accel-Redirect"], "/protected/attachments/%C3%A9vidence-finale.pdf")
+
+
 class ConformitySaveNextTests(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
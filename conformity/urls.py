@@ -27,11 +27,14 @@ urlpatterns = [
 
     path('organization/', views.OrganizationIndexView.as_view(), name='organization_index'),
     path('organization/<int:pk>', views.OrganizationDetailView.as_view(), name='organization_detail'),
+    path('organization/<int:pk>/history', views.OrganizationHistoryView.as_view(), name='organization_history'),
     path('organization/create', views.OrganizationCreateView.as_view(), name='organization_create'),
     path('organization/update/<int:pk>', views.OrganizationUpdateView.as_view(), name='organization_form'),
 
     path('framework/', views.FrameworkIndexView.as_view(), name='framework_index'),
     path('framework/<int:pk>/', views.FrameworkDetailView.as_view(), name='framework_detail'),
+    path('framework/<int:pk>/matrix', views.FrameworkMatrixView.as_view(), name='framework_matrix'),
+    path('framework/<int:pk>/matrix.csv', views.FrameworkMatrixExportView.as_view(), name='framework_matrix_export'),
 
     path('action/', views.ActionIndexView.as_view(), name='action_index'),
     path('action/create', views.ActionCreateView.as_view(), name='action_create'),
@@ -52,6 +55,7 @@ urlpatterns = [
 
     path('attachment/', views.AttachmentIndexView.as_view(), name='attachment_index'),
     path('attachment/<int:pk>/', views.AttachmentDownloadView.as_view(), name='attachment_download'),
+    path('attachment/<int:pk>/preview', views.AttachmentPreviewView.as_view(), name='attachment_preview'),
 
     path('help/', TemplateView.as_view(template_name='help.html'), name='help'),
     path('auditlog/', views.AuditLogDetailView.as_view(), name='auditlog_index'),
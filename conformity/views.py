@@ -3,22 +3,30 @@ View of the Conformity Module
 """
 
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Prefetch
 from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import UpdateView, CreateView
 from django_filters.views import FilterView
 from auditlog.models import LogEntry
 from mptt.templatetags.mptt_tags import cache_tree_children
 
+from . import dashboard, stats
 from .filterset import ActionFilter, ControlFilter, ControlPointFilter
 from .forms import ConformityForm, AuditForm, FindingForm, ActionForm, OrganizationForm, ControlForm, ControlPointForm, \
     IndicatorForm, IndicatorPointForm
 from .models import Organization, Framework, Conformity, Audit, Action, Finding, Control, ControlPoint, Attachment, \
-    Requirement, Indicator, IndicatorPoint
+    Requirement, Indicator, IndicatorPoint, FrameworkScore, ConformityHistory
 
+from django.conf import settings
 from django.views import View
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-import os
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from datetime import timedelta
+from urllib.parse import quote
+import csv
 
 #
 # Home
@@ -30,16 +38,7 @@ class HomeView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        context['organization_list'] = Organization.objects.all()
-        context['framework_list'] = Framework.objects.all()
-        context['conformity_list'] = Conformity.objects.filter(requirement__level=0)
-        context['audit_list'] = Audit.objects.all()
-        context['action_list'] = Action.objects.all()
-        context['my_action'] = Action.objects.filter(owner=user).filter(active=True).order_by('status')[:50]
-        context['my_conformity'] = Conformity.objects.filter(responsible=user).order_by('status')[:50]
-        context['cp_list'] = ControlPoint.objects.filter(status='TOBE').order_by('period_end_date')[:50]
-
+        context.update(dashboard.get(self.request.user))
         return context
 
 
@@ -112,11 +111,53 @@ class FindingUpdateView(LoginRequiredMixin, UpdateView):
 class OrganizationIndexView(LoginRequiredMixin, ListView):
     model = Organization
 
+    def get_queryset(self, **kwargs):
+        return Organization.objects.prefetch_related(
+            Prefetch('applicable_frameworks', queryset=Framework.objects.order_by('name')),
+            Prefetch('scores', queryset=FrameworkScore.objects.order_by()))
+
 
 class OrganizationDetailView(LoginRequiredMixin, DetailView):
     model = Organization
 
 
+class OrganizationHistoryView(LoginRequiredMixin, View):
+    """Time series of the Conformity status of an Organization, root requirements by default"""
+
+    # Bounds of the `days` parameter, ten years at most
+    MAX_DAYS = 3650
+
+    def get(self, request, pk):
+        organization = get_object_or_404(Organization, id=pk)
+        try:
+            days = int(request.GET.get('days', 365))
+            requirement = int(request.GET['requirement']) if request.GET.get('requirement') else None
+        except ValueError:
+            return JsonResponse({'error': "days and requirement must be integers"}, status=400)
+        days = min(max(days, 1), self.MAX_DAYS)
+        end = timezone.localdate()
+        start = end - timedelta(days=days)
+
+        history = ConformityHistory.objects.filter(organization=organization)
+        if requirement is not None:
+            history = history.filter(requirement=get_object_or_404(Requirement, id=requirement))
+        else:
+            history = history.filter(requirement__level=0)
+        series = history.series(start=start, end=end)
+
+        labels = dict(Requirement.objects
+                      .filter(id__in=[requirement_id for _, requirement_id in series])
+                      .values_list('id', 'name'))
+        return JsonResponse({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'series': [{'requirement': requirement_id,
+                        'label': labels.get(requirement_id, ''),
+                        'points': [[day.isoformat(), status] for day, status in points]}
+                       for (_, requirement_id), points in series.items()],
+        })
+
+
 class OrganizationUpdateView(LoginRequiredMixin, UpdateView):
     model = Organization
     form_class = OrganizationForm
@@ -162,6 +203,41 @@ class FrameworkDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
+class FrameworkMatrixView(LoginRequiredMixin, DetailView):
+    """Comparison of every Organization on the first level Requirement of the Framework"""
+    model = Framework
+    template_name = 'conformity/framework_matrix.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        organizations, requirements, grid = self.object.get_matrix()
+        context['requirement_list'] = requirements
+        context['matrix'] = [(name, [grid.get((organization_id, requirement_id))
+                                     for requirement_id, _, _ in requirements])
+                             for organization_id, name in organizations]
+        return context
+
+
+class FrameworkMatrixExportView(LoginRequiredMixin, View):
+    """CSV export of the Framework comparison matrix"""
+
+    def get(self, request, pk):
+        framework = get_object_or_404(Framework, id=pk)
+        organizations, requirements, grid = framework.get_matrix()
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = content_disposition_header(True, f"{framework.name}-matrix.csv")
+        writer = csv.writer(response)
+        writer.writerow(['Organization'] + [name for _, name, _ in requirements])
+        for organization_id, name in organizations:
+            row = [name]
+            for requirement_id, _, _ in requirements:
+                status, applicable = grid.get((organization_id, requirement_id), (None, True))
+                row.append('N/A' if not applicable else '' if status is None else status)
+            writer.writerow(row)
+        return response
+
+
 #
 # Conformity
 #
@@ -169,24 +245,42 @@ class ConformityIndexView(LoginRequiredMixin, ListView):
     model = Conformity
 
     def get_queryset(self, **kwargs):
-        return Conformity.objects.filter(requirement__level=0)
+        return Conformity.objects.filter(requirement__level=0) \
+            .select_related('organization', 'requirement__framework') \
+            .with_completeness()
 
 
 class ConformityDetailIndexView(LoginRequiredMixin, ListView):
     model = Conformity
     template_name = 'conformity/conformity_detail_list.html'
+    context_object_name = 'conformity_list'
 
     def get_queryset(self, **kwargs):
         return Conformity.objects.filter(organization__id=self.kwargs['org']) \
             .filter(requirement__framework__id=self.kwargs['pol']) \
-            .filter(requirement__level=0) \
-            .order_by('requirement__tree_id','requirement__lft')
+            .select_related('organization', 'requirement__framework', 'responsible') \
+            .with_evidence(titles=True) \
+            .order_by('tree_id', 'lft')
+
+    def get_context_data(self, **kwargs):
+        # The whole tree is loaded at once, then linked in memory: only the roots are listed
+        conformities = list(self.object_list)
+        leaves = [c for c in conformities if c.level and c.is_leaf_node()]
+        kwargs['object_list'] = Conformity.cache_tree_children(conformities)
+        context = super().get_context_data(**kwargs)
+        context['leaf_number'] = len(leaves)
+        context['completeness'] = round(sum(1 for c in leaves if c.status is not None) / len(leaves) * 100) \
+            if leaves else 0
+        return context
 
 
 class ConformityUpdateView(LoginRequiredMixin, UpdateView):
     model = Conformity
     form_class = ConformityForm
 
+    def get_queryset(self):
+        return Conformity.objects.select_related('organization', 'requirement').with_evidence(titles=True)
+
     def form_valid(self, form):
         # starting point of the set_status and status tree update logic
         self.object = form.save()
@@ -196,7 +290,7 @@ class ConformityUpdateView(LoginRequiredMixin, UpdateView):
             self.object.update_applicable()
         if "responsible" in form.changed_data:
             self.object.update_responsible()
-        if "status" in form.changed_data:
+        if "status" in form.changed_data or "applicable" in form.changed_data:
             self.object.update_status()
 
         # Manage Save&Next and Save&Stay submitting to allow easy filling of the conformity
@@ -256,16 +350,13 @@ class ControlIndexView(LoginRequiredMixin, FilterView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        context['controlpoint_list'] = ControlPoint.objects.all()
-        context['c1st'] = Control.objects.filter(level="1").count()
-        context['c2nd'] = Control.objects.filter(level="2").count()
-        context['cp0x'] = ControlPoint.objects.filter(status="TOBE").count()
-        context['cp1x'] = ControlPoint.objects.filter(control__frequency="1").filter(status="TOBE").count()
-        context['cp2x'] = ControlPoint.objects.filter(control__frequency="2").filter(status="TOBE").count()
-        context['cp4x'] = ControlPoint.objects.filter(control__frequency="4").filter(status="TOBE").count()
-        context['cp6x'] = ControlPoint.objects.filter(control__frequency="6").filter(status="TOBE").count()
-        context['cp12x'] = ControlPoint.objects.filter(control__frequency="12").filter(status="TOBE").count()
+        form = self.filterset.form
+        organization = form.cleaned_data.get('organization') if self.filterset.is_bound and form.is_valid() else None
+        # One aggregate per model, over the listed controls so that the counts match the filters
+        controls = self.object_list.order_by().values('pk')
+        context['organization'] = organization
+        context['control_stats'] = stats.controls(Control.objects.filter(pk__in=controls))
+        context['controlpoint_stats'] = stats.controlpoints(ControlPoint.objects.filter(control__in=controls))
 
         return context
 
@@ -285,6 +376,9 @@ class ControlPointIndexView(LoginRequiredMixin, FilterView):
     filterset_class = ControlPointFilter
     template_name = 'conformity/controlpoint_list.html'
 
+    def get_queryset(self):
+        return ControlPoint.objects.with_effective_status()
+
 
 class ControlPointUpdateView(LoginRequiredMixin, UpdateView):
     model = ControlPoint
@@ -338,15 +432,104 @@ class AttachmentIndexView(LoginRequiredMixin, ListView):
     model = Attachment
 
 
+class FileRange:
+    """File-like object reading only `length` bytes of a file, from `start`"""
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
 class AttachmentDownloadView(LoginRequiredMixin, View):
-    def get(self, pk):
+    """
+    Serve an Attachment with its mime type, length and ETag, honoring single byte Range requests.
+    With settings.ATTACHMENT_ACCEL_REDIRECT, the file is sent by nginx (see misc/nginx.conf).
+    """
+    def get(self, request, pk):
         attachment = get_object_or_404(Attachment, id=pk)
+        etag = f'"{attachment.sha256}"' if attachment.sha256 else None
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        if settings.ATTACHMENT_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=attachment.mime_type or 'application/octet-stream')
+            response['X-Accel-Redirect'] = settings.ATTACHMENT_ACCEL_REDIRECT + quote(attachment.file.name)
+        else:
+            response = self.file_response(request, attachment, etag)
+
+        response['Content-Disposition'] = content_disposition_header(True, str(attachment))
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = 'private'
+        if etag:
+            response['ETag'] = etag
+        return response
 
-        file_path = attachment.file.path
-        file_name = os.path.basename(file_path)
+    @staticmethod
+    def file_response(request, attachment, etag):
+        file = attachment.file.open('rb')
+        size = attachment.file.size
+        content_type = attachment.mime_type or 'application/octet-stream'
+        byte_range = AttachmentDownloadView.parse_range(request, size, etag)
+        if byte_range is None:
+            return FileResponse(file, content_type=content_type)
+        if byte_range is False:
+            file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
 
-        response = HttpResponse(open(file_path, 'rb'), content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    @staticmethod
+    def parse_range(request, size, etag):
+        """
+        Return the (start, end) of a satisfiable single byte Range header, False when it is not satisfiable,
+        None to send the whole file (no Range, multiple ranges, an invalid range that RFC 9110 says to ignore,
+        or an If-Range not matching the ETag)
+        """
+        header = request.headers.get('Range', '')
+        if not header.startswith('bytes=') or ',' in header:
+            return None
+        if 'If-Range' in request.headers and request.headers['If-Range'] != etag:
+            return None
+        first, _, last = header[6:].strip().partition('-')
+        if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+            return None
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+            if last and end < start:
+                return None
+        else:
+            start, end = size - int(last), size - 1
+        start, end = max(start, 0), min(end, size - 1)
+        if start > end:
+            return False
+        return start, end
+
+
+class AttachmentPreviewView(LoginRequiredMixin, View):
+    """Serve the generated preview of an Attachment, cached by the browser: its URL carries the content digest"""
+    def get(self, request, pk):
+        attachment = get_object_or_404(Attachment, id=pk)
+        if not attachment.preview:
+            raise Http404("No preview for this attachment")
+        response = FileResponse(attachment.preview.open('rb'), content_type='image/png')
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
         return response
 
 
@@ -69,6 +69,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auditlog.middleware.AuditlogMiddleware',
     'conformity.middleware.SanityCheckMiddleware',
+    'conformity.middleware.ConformityPropagationMiddleware',
 ]
 
 ROOT_URLCONF = 'oxomium.urls'
@@ -143,6 +144,35 @@ STATIC_ROOT = config('STATIC_ROOT', default='static')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Attachment storage: store each distinct file once, keyed by its SHA-256, shared by reference counting
+ATTACHMENT_DEDUPLICATION = config('ATTACHMENT_DEDUPLICATION', default=True, cast=bool)
+# Internal nginx location prefix of the attachments (e.g. /protected/), empty to stream them from Django
+ATTACHMENT_ACCEL_REDIRECT = config('ATTACHMENT_ACCEL_REDIRECT', default='')
+# Number of background threads generating the attachment previews, 0 to generate them during the upload request
+ATTACHMENT_PREVIEW_WORKERS = config('ATTACHMENT_PREVIEW_WORKERS', default=2, cast=int)
+
+# Run the daily integrity checks in a background thread of each WSGI process (else: run_daily_checks command)
+SANITY_CHECK_THREAD = config('SANITY_CHECK_THREAD', default=True, cast=bool)
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# The default local memory cache is private to each process: with several WSGI workers, set a shared backend,
+# e.g. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache and CACHE_LOCATION=/var/tmp/oxomium_cache,
+# or django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379. Otherwise the invalidation done by
+# a worker does not reach the others, which serve their copy until its lifetime below is over.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Lifetime in seconds of the cached home dashboard blocks, and so their longest staleness in the other processes
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=60, cast=int)
+# Lifetime in seconds of the cached framework comparison matrix, dropped before by any Conformity change
+MATRIX_CACHE_TTL = config('MATRIX_CACHE_TTL', default=300, cast=int)
+
 # Login / Logout configuration
 LOGIN_REDIRECT_URL = config('STATIC_ROOT', default='/')
 LOGOUT_REDIRECT_URL = config('STATIC_ROOT', default='/')
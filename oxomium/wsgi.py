@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oxomium.settings')
 
 application = get_wsgi_application()
+
+# Background thread of the daily integrity checks, when enabled by settings.SANITY_CHECK_THREAD
+from conformity import sanity  # noqa: E402  pylint: disable=wrong-import-position
+sanity.start()